@@ -0,0 +1,104 @@
+"""Benchmark of per-move spectator fan-out latency.
+
+Plays random moves on one board with many spectators subscribed in the same
+process and times each publish_move call. A share of the spectators never
+drain their queue, so the backpressure path is exercised as well. Every
+draining spectator's reconstructed board is checked against the real one at
+the end.
+
+    python bench_broadcast.py --subscribers 10000 --moves 200
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from benchmark import latency_summary
+from broadcast import BroadcastHub, SpectatorView
+from chess_board import ChessBoard
+from move_encoding import MoveList
+from time_clock import TimeClock
+
+def run_benchmark(subscribers, moves, slow_fraction=0.1, drain_every=1, seed=0):
+    rng = random.Random(seed)
+    board = ChessBoard()
+    clocks = {"white": TimeClock(600), "black": TimeClock(600)}
+    clocks["white"].start()
+
+    hub = BroadcastHub()
+    channel = hub.create_game("bench", board, clocks)
+    spectators = [channel.subscribe() for _ in range(subscribers)]
+    slow_count = int(subscribers * slow_fraction)
+    fast_spectators = spectators[slow_count:]
+
+    # A few spectators rebuild the game to prove the deltas are complete
+    views = [(spectator, SpectatorView(ChessBoard())) for spectator in fast_spectators[:10]]
+
+    valid_moves = MoveList()
+    latencies = []
+    played = 0
+    while played < moves:
+        board.generate_all_valid_moves(board.turn, valid_moves)
+        if not valid_moves:
+            # Game over, start a new one on the same channel
+            board.restore(ChessBoard().snapshot())
+            channel.publish_keyframe()
+            continue
+        move = valid_moves[rng.randrange(len(valid_moves))]
+        board.make_move(move)
+        clocks[board.turn].start()
+        clocks["black" if board.turn == "white" else "white"].stop()
+
+        start = time.perf_counter()
+        channel.publish_move(move)
+        latencies.append(time.perf_counter() - start)
+        played += 1
+
+        # Consumers run between moves, off the publishing path
+        if played % drain_every == 0:
+            for spectator, view in views:
+                for message in spectator.drain():
+                    view.apply(message)
+            for spectator in fast_spectators[len(views):]:
+                spectator.drain()
+
+    for spectator, view in views:
+        for message in spectator.drain():
+            view.apply(message)
+    # Compare pieces, castling rights, en passant target and side to move
+    expected = board.snapshot()
+    in_sync = all(view.board.snapshot()[0:5:2] == expected[0:5:2] and
+                  view.board.snapshot()[3] == expected[3] for _, view in views)
+
+    latencies.sort()
+    slow_spectators = spectators[:slow_count]
+    return {
+        "subscribers": subscribers,
+        "moves": played,
+        "slow_subscribers": slow_count,
+        "fan_out_ms": latency_summary(latencies),
+        "per_subscriber_us": round(statistics.mean(latencies) / subscribers * 1e6, 3),
+        "slow_subscriber_resyncs": sum(spectator.resyncs for spectator in slow_spectators),
+        "slow_subscriber_dropped": sum(spectator.dropped for spectator in slow_spectators),
+        "views_in_sync": in_sync,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark spectator broadcast fan-out latency.")
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--moves", type=int, default=200)
+    parser.add_argument("--slow-fraction", type=float, default=0.1,
+                        help="share of spectators that never read their queue")
+    parser.add_argument("--drain-every", type=int, default=1, help="moves between consumer reads")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.subscribers, args.moves, args.slow_fraction, args.drain_every, args.seed)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
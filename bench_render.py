@@ -0,0 +1,152 @@
+"""Benchmark of frame rendering time.
+
+Drives ChessGame.render and pygame.display.flip under SDL's dummy video
+driver for a number of scripted scenarios and prints a JSON report of the
+frame time percentiles and memory use per frame:
+
+- idle: the starting position, nothing selected
+- selected: the most mobile white piece of a middlegame selected, with its
+  available moves highlighted
+- game_over: the game-over overlay drawn over the board
+- low_time: both clocks under 30 seconds, so they are drawn in red
+
+Frames are timed first without tracing. A second, traced run of each
+scenario measures the peak Python memory allocated while drawing a frame
+and the memory blocks still held after it; allocations made by SDL itself
+are not visible to tracemalloc.
+
+    python bench_render.py --frames 2000
+"""
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+
+import pygame
+from benchmark import percentile, latency_summary
+from chess_game import ChessGame
+from move_encoding import MoveList
+
+# Opening moves leading to a middlegame for the selected scenario
+MIDDLEGAME_MOVES = ["e2e4", "e7e5", "g1f3", "b8c6", "f1c4", "g8f6", "d1e2", "f8c5", "d2d3", "d7d6"]
+
+def setup_idle(game):
+    pass
+
+def setup_selected(game):
+    moves = MoveList()
+    for text in MIDDLEGAME_MOVES:
+        game.history.record(game.board.parse_uci_move(text, moves))
+    # Select the white piece with the most moves
+    best = None
+    for row in range(game.board.rows):
+        for col in range(game.board.cols):
+            piece = game.board.board[row][col]
+            if piece and piece.color == "white":
+                game.board.generate_valid_moves(row, col, moves)
+                if best is None or len(moves) > best[0]:
+                    best = (len(moves), row, col)
+    _, row, col = best
+    game.selected_piece = (row, col)
+    game.board.generate_valid_moves(row, col, game.available_moves)
+
+def setup_game_over(game):
+    game.game_over = True
+    game.winner = "white"
+    game.time_clocks["white"].stop()
+
+def setup_low_time(game):
+    game.time_clocks["white"].time_left = 25
+    game.time_clocks["black"].time_left = 12
+
+SCENARIOS = {
+    "idle": setup_idle,
+    "selected": setup_selected,
+    "game_over": setup_game_over,
+    "low_time": setup_low_time,
+}
+
+def new_game(setup):
+    game = ChessGame()
+    # The clocks are not advanced, so every frame draws the same thing
+    game.time_clocks["white"].stop()
+    setup(game)
+    return game
+
+def draw_frame(game):
+    game.render()
+    pygame.display.flip()
+
+def time_frames(game, frames, warmup):
+    for _ in range(warmup):
+        draw_frame(game)
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        draw_frame(game)
+        times.append(time.perf_counter() - start)
+    return times
+
+def trace_frames(game, frames):
+    """Mean peak traced bytes per frame and memory blocks retained per frame"""
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    for _ in range(frames):
+        draw_frame(game)
+    gc.collect()
+    retained_blocks = (sys.getallocatedblocks() - blocks_before) / frames
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(frames):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        draw_frame(game)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    tracemalloc.stop()
+    return statistics.mean(peaks), retained_blocks
+
+def run_scenario(name, frames, warmup, traced_frames):
+    game = new_game(SCENARIOS[name])
+    times = time_frames(game, frames, warmup)
+    peak_bytes, retained_blocks = trace_frames(game, traced_frames)
+    times.sort()
+    return {
+        "frames": frames,
+        "frame_ms": latency_summary(times),
+        "fps_p50": round(1 / percentile(times, 0.50), 1),
+        "peak_alloc_bytes_per_frame": round(peak_bytes),
+        "retained_blocks_per_frame": round(retained_blocks, 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ChessGame frame rendering.")
+    parser.add_argument("--frames", type=int, default=2000, help="timed frames per scenario")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--traced-frames", type=int, default=200, help="frames measured with tracemalloc")
+    parser.add_argument("--scenarios", nargs="*", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    args = parser.parse_args(argv)
+
+    # Without fontconfig pygame warns and falls back to its default font
+    warnings.filterwarnings("ignore", module="pygame.sysfont")
+    pygame.init()
+    report = {
+        "pygame": pygame.version.ver,
+        "sdl": ".".join(str(part) for part in pygame.get_sdl_version()),
+        "scenarios": {name: run_scenario(name, args.frames, args.warmup, args.traced_frames)
+                      for name in args.scenarios},
+    }
+    pygame.quit()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""Helpers shared by the benchmark scripts"""
+import statistics
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def latency_summary(sorted_seconds):
+    """Mean, p50, p95, p99 and max in milliseconds of an already sorted list of durations"""
+    return {
+        "mean": round(statistics.mean(sorted_seconds) * 1000, 3),
+        "p50": round(percentile(sorted_seconds, 0.50) * 1000, 3),
+        "p95": round(percentile(sorted_seconds, 0.95) * 1000, 3),
+        "p99": round(percentile(sorted_seconds, 0.99) * 1000, 3),
+        "max": round(sorted_seconds[-1] * 1000, 3),
+    }
@@ -0,0 +1,207 @@
+"""Spectator broadcast hub.
+
+Fans out live game updates to many spectators. Every move is sent as a small
+fixed-size delta (move, clocks) and a full-state keyframe is produced every
+KEYFRAME_INTERVAL moves and for anyone who joins late or falls behind.
+
+Publishing never blocks the game loop: each spectator has a bounded queue of
+already-encoded messages, and a spectator whose queue is full has its backlog
+dropped and replaced by the latest keyframe.
+"""
+import struct
+from collections import deque
+
+from chess_board import pack_castling, unpack_castling, pack_en_passant, unpack_en_passant
+
+MESSAGE_KEYFRAME = 1
+MESSAGE_MOVE = 2
+MESSAGE_CLOCKS = 3
+
+# type, sequence number, white ms, black ms, running clock (0 none, 1 white, 2 black)
+CLOCKS_FORMAT = "<BIIIB"
+# CLOCKS_FORMAT plus the encoded move
+MOVE_FORMAT = "<BIIIBH"
+# CLOCKS_FORMAT plus 64 squares, castling bits, en passant square (64 for none), side to move (0 white)
+KEYFRAME_FORMAT = "<BIIIB64sBBB"
+
+KEYFRAME_INTERVAL = 32
+MAX_PENDING_MESSAGES = 64
+
+def encode_clocks(clocks):
+    """Return (white ms, black ms, running clock) from a dict of TimeClocks"""
+    if not clocks:
+        return 0, 0, 0
+    running = 1 if clocks["white"].active else 2 if clocks["black"].active else 0
+    return int(clocks["white"].time_left * 1000), int(clocks["black"].time_left * 1000), running
+
+def encode_keyframe(sequence, board, clocks):
+    """Encode the full game state"""
+    squares, _, castling, en_passant_target, turn, _ = board.snapshot()
+    return struct.pack(KEYFRAME_FORMAT, MESSAGE_KEYFRAME, sequence, *encode_clocks(clocks), squares.encode("ascii"),
+                       pack_castling(castling), pack_en_passant(en_passant_target), 0 if turn == "white" else 1)
+
+def decode_message(data):
+    """Decode a broadcast message into a dict"""
+    message_type = data[0]
+    if message_type == MESSAGE_KEYFRAME:
+        (_, sequence, white_ms, black_ms, running, squares,
+         castling_bits, en_passant, turn) = struct.unpack(KEYFRAME_FORMAT, data)
+        return {
+            "type": "keyframe",
+            "sequence": sequence,
+            "clocks": (white_ms, black_ms, running),
+            "squares": squares.decode("ascii"),
+            "castling": unpack_castling(castling_bits),
+            "en_passant_target": unpack_en_passant(en_passant),
+            "turn": "white" if turn == 0 else "black",
+        }
+    if message_type == MESSAGE_MOVE:
+        _, sequence, white_ms, black_ms, running, move = struct.unpack(MOVE_FORMAT, data)
+        return {"type": "move", "sequence": sequence, "clocks": (white_ms, black_ms, running), "move": move}
+    if message_type == MESSAGE_CLOCKS:
+        _, sequence, white_ms, black_ms, running = struct.unpack(CLOCKS_FORMAT, data)
+        return {"type": "clocks", "sequence": sequence, "clocks": (white_ms, black_ms, running)}
+    raise ValueError(f"unknown broadcast message type {message_type}")
+
+class Spectator:
+    """One viewer's queue of pending messages"""
+    def __init__(self, channel, max_pending=MAX_PENDING_MESSAGES):
+        self.channel = channel
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.dropped = 0  # Messages discarded because the spectator fell behind
+        self.resyncs = 0  # Keyframes sent to recover from dropped messages
+
+    def push(self, message):
+        """Queue a message; replace the backlog with a keyframe when full.
+        
+        Messages are published after the state changes, so the keyframe
+        already includes the message that overflowed the queue.
+        """
+        if len(self.pending) >= self.max_pending:
+            self.dropped += len(self.pending) + 1
+            self.pending.clear()
+            self.pending.append(self.channel.current_keyframe())
+            self.resyncs += 1
+            return
+        self.pending.append(message)
+
+    def drain(self, limit=None):
+        """Take up to limit pending messages (all of them by default)"""
+        pending = self.pending
+        if limit is None or limit >= len(pending):
+            messages = list(pending)
+            pending.clear()
+            return messages
+        return [pending.popleft() for _ in range(limit)]
+
+class GameChannel:
+    """Broadcast state of one game, built on its ChessBoard and TimeClocks"""
+    def __init__(self, game_id, board, clocks=None, keyframe_interval=KEYFRAME_INTERVAL):
+        self.game_id = game_id
+        self.board = board
+        self.clocks = clocks
+        self.keyframe_interval = keyframe_interval
+        self.sequence = 0
+        self.moves_since_keyframe = 0
+        self.spectators = []
+        self.keyframe = None
+        self.keyframe_sequence = -1
+
+    def current_keyframe(self):
+        """Keyframe for the current state, encoded at most once per sequence number"""
+        if self.keyframe_sequence != self.sequence:
+            self.keyframe = encode_keyframe(self.sequence, self.board, self.clocks)
+            self.keyframe_sequence = self.sequence
+        return self.keyframe
+
+    def subscribe(self, max_pending=MAX_PENDING_MESSAGES):
+        """Add a spectator, who starts from a keyframe of the current state"""
+        spectator = Spectator(self, max_pending)
+        spectator.pending.append(self.current_keyframe())
+        self.spectators.append(spectator)
+        return spectator
+
+    def unsubscribe(self, spectator):
+        self.spectators.remove(spectator)
+
+    def fan_out(self, message):
+        """Send one encoded message to every spectator"""
+        for spectator in self.spectators:
+            spectator.push(message)
+
+    def publish_move(self, move):
+        """Send a move that has just been played on the board"""
+        self.sequence += 1
+        self.fan_out(struct.pack(MOVE_FORMAT, MESSAGE_MOVE, self.sequence, *encode_clocks(self.clocks), move))
+
+        # Periodic keyframes let spectators check they are in sync
+        self.moves_since_keyframe += 1
+        if self.moves_since_keyframe >= self.keyframe_interval:
+            self.moves_since_keyframe = 0
+            self.fan_out(self.current_keyframe())
+
+    def publish_clocks(self):
+        """Send the current clock values"""
+        self.sequence += 1
+        self.fan_out(struct.pack(CLOCKS_FORMAT, MESSAGE_CLOCKS, self.sequence, *encode_clocks(self.clocks)))
+
+    def publish_keyframe(self):
+        """Send the full state, e.g. after the board was set up or reset directly"""
+        self.sequence += 1
+        self.moves_since_keyframe = 0
+        self.fan_out(self.current_keyframe())
+
+class BroadcastHub:
+    """Registry of broadcast channels by game id"""
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.channels = {}
+
+    def create_game(self, game_id, board, clocks=None):
+        channel = GameChannel(game_id, board, clocks, self.keyframe_interval)
+        self.channels[game_id] = channel
+        return channel
+
+    def close_game(self, game_id):
+        self.channels.pop(game_id, None)
+
+    def subscribe(self, game_id, max_pending=MAX_PENDING_MESSAGES):
+        return self.channels[game_id].subscribe(max_pending)
+
+    def unsubscribe(self, spectator):
+        spectator.channel.unsubscribe(spectator)
+
+    def publish_move(self, game_id, move):
+        self.channels[game_id].publish_move(move)
+
+    def publish_clocks(self, game_id):
+        self.channels[game_id].publish_clocks()
+
+    def publish_keyframe(self, game_id):
+        self.channels[game_id].publish_keyframe()
+
+class SpectatorView:
+    """Client-side game state rebuilt from broadcast messages"""
+    def __init__(self, board):
+        self.board = board
+        self.sequence = None
+        self.clocks = None
+
+    def apply(self, data):
+        """Apply one message.
+        
+        Deltas before the first keyframe, or already covered by a newer
+        keyframe, are ignored.
+        """
+        message = decode_message(data)
+        if message["type"] == "keyframe":
+            self.board.load_position(message["squares"], message["castling"],
+                                     message["en_passant_target"], message["turn"])
+        elif self.sequence is None or message["sequence"] <= self.sequence:
+            return message
+        elif message["type"] == "move":
+            self.board.make_move(message["move"])
+        self.sequence = message["sequence"]
+        self.clocks = message["clocks"]
+        return message
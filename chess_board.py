@@ -1,7 +1,83 @@
+import hashlib
 import pygame
-from chess_pieces import Pawn, Rook, Knight, Bishop, Queen, King
+from chess_pieces import (Pawn, Rook, Knight, Bishop, Queen, King, ROOK_DIRECTIONS, BISHOP_DIRECTIONS, KNIGHT_OFFSETS,
+                          get_font)
+from move_encoding import (MoveList, encode_move, move_from, move_to, move_flag, FLAG_QUIET, FLAG_CAPTURE,
+                           FLAG_DOUBLE_PAWN_PUSH, FLAG_EN_PASSANT, FLAG_PROMOTION, FLAG_KINGSIDE_CASTLE,
+                           FLAG_QUEENSIDE_CASTLE)
+from evaluation import PIECE_VALUES, piece_square_value, pawn_file_penalty, pawn_structure_score
 from config import BOARD_SIZE, SQUARE_SIZE, BOARD_MARGIN, LIGHT_SQUARE, DARK_SQUARE, HIGHLIGHT_COLOR
 
+# Single letter codes used for board snapshots (uppercase for white, like FEN)
+PIECE_LETTERS = {"pawn": "p", "rook": "r", "knight": "n", "bishop": "b", "queen": "q", "king": "k"}
+PIECE_CLASSES = {"p": Pawn, "r": Rook, "n": Knight, "b": Bishop, "q": Queen, "k": King}
+
+# Compact forms of castling rights and the en passant target, shared by
+# position_hash and the broadcast and shared-memory position formats
+NO_EN_PASSANT = 64
+
+def pack_castling(castling):
+    """Castling rights tuple in snapshot() order as bits 0-3"""
+    return sum(1 << bit for bit, allowed in enumerate(castling) if allowed)
+
+def unpack_castling(bits):
+    """Inverse of pack_castling"""
+    return tuple(bool(bits >> bit & 1) for bit in range(4))
+
+def pack_en_passant(en_passant_target):
+    """En passant target as a square number (row * 8 + col), or NO_EN_PASSANT"""
+    return en_passant_target[0] * 8 + en_passant_target[1] if en_passant_target else NO_EN_PASSANT
+
+def unpack_en_passant(square):
+    """Inverse of pack_en_passant"""
+    return None if square == NO_EN_PASSANT else divmod(square, 8)
+
+def square_name(row, col):
+    """Return the algebraic name of a square, e.g. (7, 4) -> e1"""
+    return chr(97 + col) + str(8 - row)
+
+def parse_square(name):
+    """Return the (row, col) of an algebraic square name, e.g. e1 -> (7, 4)"""
+    if len(name) != 2 or name[0] not in "abcdefgh" or name[1] not in "12345678":
+        raise ValueError(f"invalid square: {name!r}")
+    return 8 - int(name[1]), ord(name[0]) - 97
+
+class MoveRecord:
+    """Everything needed to take back a move made with ChessBoard.make_move"""
+    def __init__(self, board, move):
+        self.move = move  # Encoded move, see move_encoding
+        self.from_row, self.from_col = move_from(move)
+        self.to_row, self.to_col = move_to(move)
+        
+        # Moving piece and its state before the move
+        self.piece = board.board[self.from_row][self.from_col]
+        self.had_moved = self.piece.has_moved
+        
+        # Filled in by make_move for captures, castling and promotion
+        self.captured_piece = None
+        self.captured_pos = None
+        self.rook_move = None  # (row, original col, new col) when castling
+        self.promoted_piece = None
+        
+        # Board state before the move
+        self.castling_rights = {color: dict(rights) for color, rights in board.castling_rights.items()}
+        self.en_passant_target = board.en_passant_target
+        self.last_moved_piece = board.last_moved_piece
+        self.white_king_pos = board.white_king_pos
+        self.black_king_pos = board.black_king_pos
+        self.turn = board.turn
+    
+    def changed_squares(self):
+        """Squares whose contents differ before and after the move"""
+        squares = [(self.from_row, self.from_col), (self.to_row, self.to_col)]
+        if self.captured_pos and self.captured_pos != (self.to_row, self.to_col):
+            squares.append(self.captured_pos)
+        if self.rook_move:
+            rook_row, original_col, new_col = self.rook_move
+            squares.append((rook_row, original_col))
+            squares.append((rook_row, new_col))
+        return squares
+
 class ChessBoard:
     def __init__(self):
         # Board dimensions
@@ -19,6 +95,20 @@ class ChessBoard:
         self.board = [[None for _ in range(self.cols)] for _ in range(self.rows)]
         self.setup_pieces()
         
+        # Number of pieces of each color attacking every square, kept up to
+        # date by make_move and undo_move
+        self.attack_maps = {}
+        self.piece_attacks = {}  # Squares each piece currently attacks
+        self.rebuild_attack_maps()
+        
+        # Evaluation totals from white's point of view (see evaluation.py),
+        # kept up to date by make_move and undo_move
+        self.material = 0
+        self.piece_square_score = 0
+        self.pawn_files = {}  # Number of pawns of each color on each file
+        self.pawn_structure = 0
+        self.recompute_evaluation()
+        
         # Game state tracking
         self.last_moved_piece = None
         self.white_king_pos = (7, 4)  # Initial position of white king
@@ -30,6 +120,9 @@ class ChessBoard:
         
         # For tracking en passant
         self.en_passant_target = None
+        
+        # Side to move, flipped by every make_move call
+        self.turn = "white"
     
     def setup_pieces(self):
         """Set up the initial chess board with all pieces"""
@@ -76,12 +169,12 @@ class ChessBoard:
                 
                 # Draw coordinates
                 if col == 0:  # Row numbers on the left
-                    font = pygame.font.SysFont("Arial", 12)
+                    font = get_font("Arial", 12)
                     text = font.render(str(8 - row), True, (0, 0, 0))
                     screen.blit(text, (self.board_margin - 15, y + self.square_size // 2 - 6))
                 
                 if row == 7:  # Column letters on the bottom
-                    font = pygame.font.SysFont("Arial", 12)
+                    font = get_font("Arial", 12)
                     text = font.render(chr(97 + col), True, (0, 0, 0))
                     screen.blit(text, (x + self.square_size // 2 - 4, 
                                       self.board_margin + 8 * self.square_size + 5))
@@ -127,26 +220,136 @@ class ChessBoard:
     
     def get_valid_moves(self, row, col):
         """Get all valid moves for a piece at the given position"""
+        moves = MoveList()
+        self.generate_valid_moves(row, col, moves)
+        return [move_to(move) for move in moves]
+    
+    def get_all_valid_moves(self, color):
+        """Get every valid move for the given color as (from_row, from_col, to_row, to_col)"""
+        moves = MoveList()
+        self.generate_all_valid_moves(color, moves)
+        return [move_from(move) + move_to(move) for move in moves]
+    
+    def generate_valid_moves(self, row, col, moves):
+        """Fill a MoveList with the encoded valid moves of the piece at the given position"""
+        moves.clear()
         piece = self.get_piece(row, col)
-        if not piece:
-            return []
+        if piece:
+            piece.generate_moves(self, moves)
+            self.remove_illegal_moves(moves, 0)
+    
+    def generate_all_valid_moves(self, color, moves):
+        """Fill a MoveList with every encoded valid move for the given color"""
+        moves.clear()
+        for row in self.board:
+            for piece in row:
+                if piece and piece.color == color:
+                    piece.generate_moves(self, moves)
+        self.remove_illegal_moves(moves, 0)
+    
+    def remove_illegal_moves(self, moves, start):
+        """Compact the MoveList in place, keeping only moves that leave the own king safe"""
+        buffer = moves.moves
+        kept = start
+        for index in range(start, moves.count):
+            move = buffer[index]
+            if self.is_legal_move(move):
+                buffer[kept] = move
+                kept += 1
+        moves.count = kept
+    
+    def is_legal_move(self, move):
+        """Check that an encoded possible move does not leave the mover's king in check"""
+        from_row, from_col = move_from(move)
+        to_row, to_col = move_to(move)
+        piece = self.board[from_row][from_col]
+        
+        # En passant removes a pawn that is not on the destination square
+        if move_flag(move) == FLAG_EN_PASSANT:
+            captured_row, captured_col = from_row, to_col
+        else:
+            captured_row, captured_col = to_row, to_col
+        captured_piece = self.board[captured_row][captured_col]
+        
+        # Temporarily make the move
+        self.board[captured_row][captured_col] = None
+        self.board[to_row][to_col] = piece
+        self.board[from_row][from_col] = None
         
-        # Get all possible moves for this piece
-        possible_moves = piece.get_possible_moves(self)
+        if piece.piece_type == "king":
+            king_row, king_col = to_row, to_col
+        else:
+            king_row, king_col = self.white_king_pos if piece.color == "white" else self.black_king_pos
+        opponent_color = "black" if piece.color == "white" else "white"
+        in_check = self.is_square_attacked(king_row, king_col, opponent_color)
         
-        # Filter out moves that would put or leave the king in check
-        valid_moves = []
-        for move_row, move_col in possible_moves:
-            if not self.would_be_in_check_after_move(row, col, move_row, move_col, piece.color):
-                valid_moves.append((move_row, move_col))
+        # Restore board state
+        self.board[from_row][from_col] = piece
+        self.board[to_row][to_col] = None
+        self.board[captured_row][captured_col] = captured_piece
         
-        return valid_moves
+        return not in_check
+    
+    def encode_move(self, from_row, from_col, to_row, to_col):
+        """Encode a move given by coordinates, working out its flags from the board"""
+        piece = self.board[from_row][from_col]
+        flag = FLAG_CAPTURE if self.board[to_row][to_col] else FLAG_QUIET
+        
+        if piece and piece.piece_type == "king" and abs(from_col - to_col) == 2:
+            flag = FLAG_KINGSIDE_CASTLE if to_col > from_col else FLAG_QUEENSIDE_CASTLE
+        elif piece and piece.piece_type == "pawn":
+            if abs(from_row - to_row) == 2:
+                flag = FLAG_DOUBLE_PAWN_PUSH
+            elif abs(from_col - to_col) == 1 and self.board[to_row][to_col] is None:
+                # A diagonal pawn move to an empty square must be en passant
+                flag = FLAG_EN_PASSANT
+            if to_row == 0 or to_row == 7:
+                flag |= FLAG_PROMOTION
+        
+        return encode_move(from_row, from_col, to_row, to_col, flag)
+    
+    def parse_uci_move(self, text, moves):
+        """Return the valid encoded move for a UCI move like e2e4 or e7e8q.
+        
+        moves is a MoveList that is filled with the valid moves of the side
+        to move. Raises ValueError for malformed and illegal moves. Pawns
+        always promote to a queen in this game (see FLAG_PROMOTION), so
+        underpromotions like e7e8n are rejected too.
+        """
+        if len(text) not in (4, 5):
+            raise ValueError(f"invalid move {text!r}")
+        if text[4:] not in ("", "q"):
+            raise ValueError(f"unsupported promotion {text}")
+        from_square, to_square = parse_square(text[0:2]), parse_square(text[2:4])
+        self.generate_all_valid_moves(self.turn, moves)
+        move = moves.find(*from_square, *to_square)
+        if not move:
+            raise ValueError(f"illegal move {text}")
+        return move
     
     def move_piece(self, from_row, from_col, to_row, to_col):
-        """Move a piece from one position to another"""
+        """Move a piece from one position to another.
+        
+        The move flags are worked out from the board; see make_move.
+        """
+        return self.make_move(self.encode_move(from_row, from_col, to_row, to_col))
+    
+    def make_move(self, move):
+        """Play an encoded move from move_encoding.
+        
+        Returns a MoveRecord that can be passed to undo_move, or False if
+        there is no piece on the starting square.
+        """
+        from_row, from_col = move_from(move)
+        to_row, to_col = move_to(move)
+        flag = move_flag(move)
+        
         piece = self.board[from_row][from_col]
         if not piece:
             return False
+        
+        record = MoveRecord(self, move)
+        self.turn = "black" if piece.color == "white" else "white"
             
         # Reset en passant target
         self.en_passant_target = None
@@ -161,23 +364,22 @@ class ChessBoard:
             # Update castling rights
             self.castling_rights[piece.color]["kingside"] = False
             self.castling_rights[piece.color]["queenside"] = False
-            
-            # Handle castling move
-            if abs(from_col - to_col) == 2:
-                # Kingside castling
-                if to_col > from_col:
-                    rook = self.board[from_row][7]
-                    self.board[from_row][5] = rook
-                    self.board[from_row][7] = None
-                    if rook:
-                        rook.row, rook.col = from_row, 5
-                # Queenside castling
-                else:
-                    rook = self.board[from_row][0]
-                    self.board[from_row][3] = rook
-                    self.board[from_row][0] = None
-                    if rook:
-                        rook.row, rook.col = from_row, 3
+        
+        # Handle castling move
+        if flag == FLAG_KINGSIDE_CASTLE:
+            rook = self.board[from_row][7]
+            record.rook_move = (from_row, 7, 5)
+            self.board[from_row][5] = rook
+            self.board[from_row][7] = None
+            if rook:
+                rook.row, rook.col = from_row, 5
+        elif flag == FLAG_QUEENSIDE_CASTLE:
+            rook = self.board[from_row][0]
+            record.rook_move = (from_row, 0, 3)
+            self.board[from_row][3] = rook
+            self.board[from_row][0] = None
+            if rook:
+                rook.row, rook.col = from_row, 3
         
         # Update rook's castling rights
         if piece.piece_type == "rook":
@@ -193,29 +395,39 @@ class ChessBoard:
                     self.castling_rights["black"]["kingside"] = False
                     
         # Handle pawn special moves
-        if piece.piece_type == "pawn":
-            # Check for double move (for en passant)
-            if abs(from_row - to_row) == 2:
-                self.en_passant_target = (to_row, to_col)
-                
-            # Check for en passant capture
-            if abs(from_col - to_col) == 1 and self.board[to_row][to_col] is None:
-                # This must be an en passant capture since normal diagonal moves require a piece
-                captured_pawn_row = from_row
-                captured_pawn_col = to_col
-                self.board[captured_pawn_row][captured_pawn_col] = None
-        
-            # Handle pawn promotion
-            if to_row == 0 or to_row == 7:
-                self.board[from_row][from_col] = None
-                # Create a new Queen at the promoted position
-                self.board[to_row][to_col] = Queen(piece.color, to_row, to_col)
-                # Set last_moved_piece for checking
-                self.last_moved_piece = self.board[to_row][to_col]
-                return True
+        if flag == FLAG_DOUBLE_PAWN_PUSH:
+            # Remember the pawn for en passant
+            self.en_passant_target = (to_row, to_col)
+        elif flag == FLAG_EN_PASSANT:
+            # The captured pawn sits beside the moving pawn, not on the target square
+            captured_pawn_row = from_row
+            captured_pawn_col = to_col
+            record.captured_piece = self.board[captured_pawn_row][captured_pawn_col]
+            record.captured_pos = (captured_pawn_row, captured_pawn_col)
+            self.board[captured_pawn_row][captured_pawn_col] = None
+        
+        # Handle pawn promotion
+        if flag & FLAG_PROMOTION:
+            if self.board[to_row][to_col]:
+                record.captured_piece = self.board[to_row][to_col]
+                record.captured_pos = (to_row, to_col)
+                self.revoke_castling_rights_for_capture(record.captured_piece)
+            self.board[from_row][from_col] = None
+            # Create a new Queen at the promoted position
+            self.board[to_row][to_col] = Queen(piece.color, to_row, to_col)
+            record.promoted_piece = self.board[to_row][to_col]
+            # Set last_moved_piece for checking
+            self.last_moved_piece = self.board[to_row][to_col]
+            self.update_attack_maps(record.changed_squares(), [piece, record.captured_piece])
+            self.update_evaluation(record, 1)
+            return record
         
         # Regular move
         captured_piece = self.board[to_row][to_col]
+        if captured_piece:
+            record.captured_piece = captured_piece
+            record.captured_pos = (to_row, to_col)
+            self.revoke_castling_rights_for_capture(captured_piece)
         self.board[to_row][to_col] = piece
         self.board[from_row][from_col] = None
         
@@ -224,7 +436,443 @@ class ChessBoard:
         piece.has_moved = True
         
         self.last_moved_piece = piece
-        return True
+        self.update_attack_maps(record.changed_squares(), [record.captured_piece])
+        self.update_evaluation(record, 1)
+        return record
+    
+    def revoke_castling_rights_for_capture(self, captured_piece):
+        """A rook captured on its starting corner can no longer castle"""
+        if captured_piece.piece_type != "rook":
+            return
+        home_row = 7 if captured_piece.color == "white" else 0
+        if captured_piece.row == home_row:
+            if captured_piece.col == 0:
+                self.castling_rights[captured_piece.color]["queenside"] = False
+            elif captured_piece.col == 7:
+                self.castling_rights[captured_piece.color]["kingside"] = False
+    
+    def undo_move(self, record):
+        """Take back a move using the MoveRecord returned by make_move or move_piece"""
+        # Needs the board as the move left it, so it goes first
+        self.update_evaluation(record, -1)
+        piece = record.piece
+        
+        # Put the moving piece back (this also removes a promoted queen)
+        self.board[record.to_row][record.to_col] = None
+        self.board[record.from_row][record.from_col] = piece
+        piece.row, piece.col = record.from_row, record.from_col
+        piece.has_moved = record.had_moved
+        
+        # Restore a captured piece (en passant captures are not on the target square)
+        if record.captured_piece:
+            captured_row, captured_col = record.captured_pos
+            self.board[captured_row][captured_col] = record.captured_piece
+        
+        # Move the rook back after castling
+        if record.rook_move:
+            rook_row, original_col, new_col = record.rook_move
+            rook = self.board[rook_row][new_col]
+            self.board[rook_row][original_col] = rook
+            self.board[rook_row][new_col] = None
+            if rook:
+                rook.row, rook.col = rook_row, original_col
+        
+        # Restore game state tracking
+        self.castling_rights = {color: dict(rights) for color, rights in record.castling_rights.items()}
+        self.en_passant_target = record.en_passant_target
+        self.last_moved_piece = record.last_moved_piece
+        self.white_king_pos = record.white_king_pos
+        self.black_king_pos = record.black_king_pos
+        self.turn = record.turn
+        
+        self.update_attack_maps(record.changed_squares(), [record.promoted_piece])
+    
+    def snapshot(self):
+        """Return an immutable copy of the full board state.
+        
+        The snapshot is a tuple of (squares, moved mask, castling rights,
+        en passant target, side to move, last moved square). Squares is a
+        64 character string in row order using PIECE_LETTERS ("." for empty,
+        uppercase for white) and the moved mask has bit row * 8 + col set for
+        every piece that has moved.
+        """
+        squares = []
+        moved_mask = 0
+        for row in range(self.rows):
+            for col in range(self.cols):
+                piece = self.board[row][col]
+                if piece is None:
+                    squares.append(".")
+                    continue
+                letter = PIECE_LETTERS[piece.piece_type]
+                squares.append(letter.upper() if piece.color == "white" else letter)
+                if piece.has_moved:
+                    moved_mask |= 1 << (row * self.cols + col)
+        
+        castling = (self.castling_rights["white"]["kingside"], self.castling_rights["white"]["queenside"],
+                    self.castling_rights["black"]["kingside"], self.castling_rights["black"]["queenside"])
+        last_moved = None
+        if self.last_moved_piece is not None:
+            last_moved = (self.last_moved_piece.row, self.last_moved_piece.col)
+        
+        return ("".join(squares), moved_mask, castling, self.en_passant_target, self.turn, last_moved)
+    
+    def restore(self, snapshot):
+        """Restore the board to a state returned by snapshot()"""
+        squares, moved_mask, castling, en_passant_target, turn, last_moved = snapshot
+        
+        self.board = [[None for _ in range(self.cols)] for _ in range(self.rows)]
+        for index, letter in enumerate(squares):
+            if letter == ".":
+                continue
+            row, col = divmod(index, self.cols)
+            color = "white" if letter.isupper() else "black"
+            piece = PIECE_CLASSES[letter.lower()](color, row, col)
+            piece.has_moved = bool(moved_mask >> index & 1)
+            self.board[row][col] = piece
+            if piece.piece_type == "king":
+                if color == "white":
+                    self.white_king_pos = (row, col)
+                else:
+                    self.black_king_pos = (row, col)
+        
+        self.castling_rights = {
+            "white": {"kingside": castling[0], "queenside": castling[1]},
+            "black": {"kingside": castling[2], "queenside": castling[3]}
+        }
+        self.en_passant_target = en_passant_target
+        self.turn = turn
+        self.last_moved_piece = self.get_piece(*last_moved) if last_moved else None
+        self.rebuild_attack_maps()
+        self.recompute_evaluation()
+    
+    def capturable_en_passant_target(self):
+        """The en passant target if a pawn of the side to move stands next to it, else None.
+        
+        A target no pawn can take does not change the position, so hashes,
+        FEN and repetition keys use this instead of en_passant_target to keep
+        transpositions (1.d4 Nf6 2.c4 and 1.c4 Nf6 2.d4) the same position.
+        """
+        if not self.en_passant_target:
+            return None
+        row, col = self.en_passant_target
+        for adjacent_col in (col - 1, col + 1):
+            if 0 <= adjacent_col < self.cols:
+                piece = self.board[row][adjacent_col]
+                if piece and piece.piece_type == "pawn" and piece.color == self.turn:
+                    return self.en_passant_target
+        return None
+    
+    def position_hash(self):
+        """Stable 64-bit hash of the position: pieces, castling rights, en passant target and side to move"""
+        squares, _, castling, _, turn, _ = self.snapshot()
+        key = squares.encode("ascii") + bytes((pack_castling(castling),
+                                               pack_en_passant(self.capturable_en_passant_target()),
+                                               turn == "white"))
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+    
+    def load_position(self, squares, castling, en_passant_target, turn):
+        """Set up a position from the parts that matter for play.
+        
+        Takes the same squares string, castling tuple, en passant target and
+        side to move as snapshot(). Which pieces have moved is derived:
+        pawns on their starting rank and kings and rooks that keep castling
+        rights are unmoved, everything else counts as moved.
+        """
+        unmoved = set()
+        for col in range(self.cols):
+            unmoved.add((6 * self.cols + col, "P"))
+            unmoved.add((1 * self.cols + col, "p"))
+        white_kingside, white_queenside, black_kingside, black_queenside = castling
+        if white_kingside or white_queenside:
+            unmoved.add((7 * self.cols + 4, "K"))
+        if white_kingside:
+            unmoved.add((7 * self.cols + 7, "R"))
+        if white_queenside:
+            unmoved.add((7 * self.cols + 0, "R"))
+        if black_kingside or black_queenside:
+            unmoved.add((4, "k"))
+        if black_kingside:
+            unmoved.add((7, "r"))
+        if black_queenside:
+            unmoved.add((0, "r"))
+        
+        moved_mask = 0
+        for index, letter in enumerate(squares):
+            if letter != "." and (index, letter) not in unmoved:
+                moved_mask |= 1 << index
+        
+        self.restore((squares, moved_mask, tuple(castling), en_passant_target, turn, None))
+    
+    def load_fen(self, fen):
+        """Set up the position described by a FEN string.
+        
+        Returns (halfmove clock, fullmove number), which the board itself
+        does not track.
+        """
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"invalid FEN: {fen!r}")
+        placement, active_color, castling_field, en_passant_field = fields[:4]
+        
+        ranks = placement.split("/")
+        if len(ranks) != self.rows:
+            raise ValueError(f"invalid FEN piece placement: {placement!r}")
+        squares = []
+        for rank in ranks:
+            row = ""
+            for char in rank:
+                if char.isdigit():
+                    row += "." * int(char)
+                elif char.lower() in PIECE_CLASSES:
+                    row += char
+                else:
+                    raise ValueError(f"invalid FEN piece: {char!r}")
+            if len(row) != self.cols:
+                raise ValueError(f"invalid FEN rank: {rank!r}")
+            squares.append(row)
+        squares = "".join(squares)
+        if squares.count("K") != 1 or squares.count("k") != 1:
+            raise ValueError("FEN must have exactly one king per side")
+        
+        if active_color not in ("w", "b"):
+            raise ValueError(f"invalid FEN active color: {active_color!r}")
+        turn = "white" if active_color == "w" else "black"
+        castling = tuple(flag in castling_field for flag in "KQkq")
+        
+        # FEN names the square behind the pawn; the board tracks the pawn itself
+        en_passant_target = None
+        if en_passant_field != "-":
+            behind_row, col = parse_square(en_passant_field)
+            # The square behind a pawn that just moved two: rank 6 with white to move, rank 3 with black
+            if behind_row != (2 if turn == "white" else 5):
+                raise ValueError(f"invalid FEN en passant square for {turn} to move: {en_passant_field!r}")
+            pawn_row = behind_row + 1 if turn == "white" else behind_row - 1
+            pawn = squares[pawn_row * self.cols + col]
+            if pawn == ("p" if turn == "white" else "P"):
+                en_passant_target = (pawn_row, col)
+        
+        self.load_position(squares, castling, en_passant_target, turn)
+        
+        halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        return halfmove_clock, fullmove_number
+    
+    def to_fen(self, halfmove_clock=0, fullmove_number=1):
+        """Return the position as a FEN string"""
+        squares, _, castling, _, turn, _ = self.snapshot()
+        en_passant_target = self.capturable_en_passant_target()
+        
+        ranks = []
+        for row in range(self.rows):
+            rank = ""
+            empty = 0
+            for letter in squares[row * self.cols:(row + 1) * self.cols]:
+                if letter == ".":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += letter
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        
+        castling_field = "".join(flag for flag, allowed in zip("KQkq", castling) if allowed) or "-"
+        en_passant_field = "-"
+        if en_passant_target:
+            pawn_row, col = en_passant_target
+            behind_row = pawn_row - 1 if turn == "white" else pawn_row + 1
+            en_passant_field = square_name(behind_row, col)
+        
+        return " ".join(["/".join(ranks), "w" if turn == "white" else "b", castling_field,
+                         en_passant_field, str(halfmove_clock), str(fullmove_number)])
+    
+    def rebuild_attack_maps(self):
+        """Recompute the attack maps from scratch.
+        
+        Needed after the board is edited directly instead of through
+        make_move, e.g. when setting up a custom position.
+        """
+        self.attack_maps = {
+            "white": [[0] * self.cols for _ in range(self.rows)],
+            "black": [[0] * self.cols for _ in range(self.rows)]
+        }
+        self.piece_attacks = {}
+        for row in range(self.rows):
+            for col in range(self.cols):
+                piece = self.board[row][col]
+                if piece:
+                    self.add_piece_attacks(piece)
+    
+    def add_piece_attacks(self, piece):
+        """Add a piece's attacks to its color's attack map"""
+        squares = piece.get_attacked_squares(self)
+        attack_map = self.attack_maps[piece.color]
+        for row, col in squares:
+            attack_map[row][col] += 1
+        self.piece_attacks[piece] = squares
+    
+    def remove_piece_attacks(self, piece):
+        """Remove a piece's stored attacks from its color's attack map"""
+        squares = self.piece_attacks.pop(piece, None)
+        if squares:
+            attack_map = self.attack_maps[piece.color]
+            for row, col in squares:
+                attack_map[row][col] -= 1
+    
+    def update_attack_maps(self, changed_squares, removed_pieces):
+        """Update the attack maps after the given squares changed.
+        
+        Only the pieces standing on changed squares and the sliding pieces
+        whose lines run through them are recomputed. removed_pieces are
+        pieces that left the board (None entries are ignored).
+        """
+        for piece in removed_pieces:
+            if piece:
+                self.remove_piece_attacks(piece)
+        
+        affected = []
+        for row, col in changed_squares:
+            piece = self.board[row][col]
+            if piece and piece not in affected:
+                affected.append(piece)
+            
+            # The first piece along each line is the only one that can see this square
+            for directions, slider_types in ((ROOK_DIRECTIONS, ("rook", "queen")),
+                                             (BISHOP_DIRECTIONS, ("bishop", "queen"))):
+                for dr, dc in directions:
+                    new_row, new_col = row + dr, col + dc
+                    while 0 <= new_row < self.rows and 0 <= new_col < self.cols:
+                        piece = self.board[new_row][new_col]
+                        if piece:
+                            if piece.piece_type in slider_types and piece not in affected:
+                                affected.append(piece)
+                            break
+                        new_row += dr
+                        new_col += dc
+        
+        for piece in affected:
+            self.remove_piece_attacks(piece)
+            self.add_piece_attacks(piece)
+    
+    def compute_evaluation(self):
+        """Count the evaluation totals from scratch.
+        
+        Returns (material, piece-square score, pawn files, pawn structure)
+        without changing the board, so the incrementally kept totals can be
+        checked against it.
+        """
+        material = 0
+        piece_square_score = 0
+        pawn_files = {"white": [0] * self.cols, "black": [0] * self.cols}
+        for row in range(self.rows):
+            for col in range(self.cols):
+                piece = self.board[row][col]
+                if not piece:
+                    continue
+                sign = 1 if piece.color == "white" else -1
+                material += sign * PIECE_VALUES[piece.piece_type]
+                piece_square_score += sign * piece_square_value(piece.piece_type, piece.color, row, col)
+                if piece.piece_type == "pawn":
+                    pawn_files[piece.color][col] += 1
+        return material, piece_square_score, pawn_files, pawn_structure_score(pawn_files)
+    
+    def recompute_evaluation(self):
+        """Recompute the evaluation totals from scratch.
+        
+        Needed after the board is edited directly instead of through
+        make_move, like rebuild_attack_maps.
+        """
+        self.material, self.piece_square_score, self.pawn_files, self.pawn_structure = self.compute_evaluation()
+    
+    def update_evaluation(self, record, sign):
+        """Add a move's effect to the evaluation totals (sign 1) or take it back (sign -1).
+        
+        Must be called while the board is in the position after the move,
+        i.e. at the end of make_move and at the start of undo_move.
+        """
+        removed = [(record.piece, record.from_row, record.from_col)]
+        added = [(record.promoted_piece or record.piece, record.to_row, record.to_col)]
+        if record.captured_piece:
+            removed.append((record.captured_piece, *record.captured_pos))
+        if record.rook_move:
+            rook_row, original_col, new_col = record.rook_move
+            rook = self.board[rook_row][new_col]
+            if rook:
+                removed.append((rook, rook_row, original_col))
+                added.append((rook, rook_row, new_col))
+        
+        pawn_changes = []
+        for pieces, direction in ((removed, -sign), (added, sign)):
+            for piece, row, col in pieces:
+                color_sign = direction if piece.color == "white" else -direction
+                self.material += color_sign * PIECE_VALUES[piece.piece_type]
+                self.piece_square_score += color_sign * piece_square_value(piece.piece_type, piece.color, row, col)
+                if piece.piece_type == "pawn":
+                    pawn_changes.append((piece.color, col, direction))
+        if not pawn_changes:
+            return
+        
+        # A file's pawn terms depend on its neighbours, so rescore those too
+        files = set()
+        for _, col, _ in pawn_changes:
+            files.update(file for file in (col - 1, col, col + 1) if 0 <= file < self.cols)
+        before = self.pawn_structure_on_files(files)
+        for color, col, direction in pawn_changes:
+            self.pawn_files[color][col] += direction
+        self.pawn_structure += self.pawn_structure_on_files(files) - before
+    
+    def pawn_structure_on_files(self, files):
+        """Pawn structure terms of the given files, from white's point of view"""
+        score = 0
+        for col in files:
+            score -= pawn_file_penalty(self.pawn_files["white"], col)
+            score += pawn_file_penalty(self.pawn_files["black"], col)
+        return score
+    
+    def evaluate(self):
+        """Static evaluation in centipawns from the side to move's point of view.
+        
+        Only adds up the kept totals, so it does not look at the board.
+        """
+        score = self.material + self.piece_square_score + self.pawn_structure
+        return score if self.turn == "white" else -score
+    
+    def is_square_attacked(self, row, col, by_color):
+        """Check if any piece of by_color attacks the square by scanning outward from it.
+        
+        Unlike attack_maps this does not rely on incremental state, so it can
+        be used while the board is temporarily modified.
+        """
+        # Pawns attack diagonally forward, so look one row back towards them
+        pawn_row = row + 1 if by_color == "white" else row - 1
+        for pawn_col in (col - 1, col + 1):
+            piece = self.get_piece(pawn_row, pawn_col)
+            if piece and piece.color == by_color and piece.piece_type == "pawn":
+                return True
+        
+        for offsets, piece_type in ((KNIGHT_OFFSETS, "knight"), (ROOK_DIRECTIONS + BISHOP_DIRECTIONS, "king")):
+            for dr, dc in offsets:
+                piece = self.get_piece(row + dr, col + dc)
+                if piece and piece.color == by_color and piece.piece_type == piece_type:
+                    return True
+        
+        for directions, slider_types in ((ROOK_DIRECTIONS, ("rook", "queen")),
+                                         (BISHOP_DIRECTIONS, ("bishop", "queen"))):
+            for dr, dc in directions:
+                new_row, new_col = row + dr, col + dc
+                while 0 <= new_row < self.rows and 0 <= new_col < self.cols:
+                    piece = self.board[new_row][new_col]
+                    if piece:
+                        if piece.color == by_color and piece.piece_type in slider_types:
+                            return True
+                        break
+                    new_row += dr
+                    new_col += dc
+        
+        return False
     
     def is_in_check(self, color):
         """Check if the king of the given color is in check"""
@@ -232,17 +880,9 @@ class ChessBoard:
         king_pos = self.white_king_pos if color == "white" else self.black_king_pos
         king_row, king_col = king_pos
         
-        # Check if any opponent piece can attack the king
+        # Check if any opponent piece attacks the king
         opponent_color = "black" if color == "white" else "white"
-        for row in range(self.rows):
-            for col in range(self.cols):
-                piece = self.get_piece(row, col)
-                if piece and piece.color == opponent_color:
-                    moves = piece.get_possible_moves(self, check_king_safety=False)
-                    if king_pos in moves:
-                        return True
-        
-        return False
+        return self.attack_maps[opponent_color][king_row][king_col] > 0
     
     def would_be_in_check_after_move(self, from_row, from_col, to_row, to_col, color):
         """Check if the king would be in check after a move"""
@@ -265,8 +905,11 @@ class ChessBoard:
         self.board[to_row][to_col] = piece
         self.board[from_row][from_col] = None
         
-        # Check if king is in check
-        in_check = self.is_in_check(color)
+        # Check if king is in check (the attack maps are not updated for
+        # this temporary move, so scan from the king instead)
+        king_row, king_col = self.white_king_pos if color == "white" else self.black_king_pos
+        opponent_color = "black" if color == "white" else "white"
+        in_check = self.is_square_attacked(king_row, king_col, opponent_color)
         
         # Restore board state
         self.board[from_row][from_col] = piece
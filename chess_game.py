@@ -1,8 +1,12 @@
 import pygame
 from chess_board import ChessBoard
-from chess_pieces import Piece
+from game_history import GameHistory
+from chess_pieces import Piece, get_font
+from move_encoding import MoveList, move_to
+from position_index import PositionIndex
 from time_clock import TimeClock
-from config import SCREEN_WIDTH, SCREEN_HEIGHT, BACKGROUND_COLOR, DEFAULT_TIME_MINUTES
+from config import (SCREEN_WIDTH, SCREEN_HEIGHT, BACKGROUND_COLOR, DEFAULT_TIME_MINUTES, ATTACK_HIGHLIGHT,
+                    POSITION_INDEX_PATH)
 
 class ChessGame:
     def __init__(self):
@@ -17,10 +21,22 @@ class ChessGame:
         # Create chess board
         self.board = ChessBoard()
         
+        # Record every move so the game can be taken back or reviewed
+        self.history = GameHistory(self.board)
+        
         # Set up game state
         self.current_player = "white"
         self.selected_piece = None
-        self.available_moves = []
+        # Encoded moves of the selected piece, reused for every selection
+        self.available_moves = MoveList()
+        
+        # Optional broadcast.GameChannel that spectators receive moves from
+        self.broadcast = None
+        # Whole seconds left on each clock when they were last broadcast
+        self.broadcast_clock_seconds = None
+        
+        # Overlay of squares the opponent attacks, toggled with the A key
+        self.show_attacks = False
         
         # Set up time clocks (10 minutes per player)
         self.time_clocks = {
@@ -36,6 +52,13 @@ class ChessGame:
         self.game_over = False
         self.winner = None
         
+        # "Seen in games" statistics for the current position, if an index is configured
+        self.position_index = None
+        self.position_stats = None
+        if POSITION_INDEX_PATH:
+            self.position_index = PositionIndex(POSITION_INDEX_PATH)
+            self.update_position_stats()
+        
     def load_resources(self):
         """Load game resources like images and sounds"""
         # This will be implemented to load piece images and other assets
@@ -46,6 +69,9 @@ class ChessGame:
         if self.game_over:
             # Only handle restart or quit events if game is over
             return
+        
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_a:
+            self.show_attacks = not self.show_attacks
             
         if event.type == pygame.MOUSEBUTTONDOWN:
             # Get mouse position
@@ -60,10 +86,11 @@ class ChessGame:
                 # If a piece is already selected
                 if self.selected_piece:
                     # Check if clicked position is in available moves
-                    if (row, col) in self.available_moves:
+                    old_row, old_col = self.selected_piece
+                    move = self.available_moves.find(old_row, old_col, row, col)
+                    if move:
                         # Move the piece
-                        old_row, old_col = self.selected_piece
-                        self.board.move_piece(old_row, old_col, row, col)
+                        self.history.record(move)
                         
                         # If this is the first move of the game
                         if not self.clocks_active:
@@ -78,6 +105,12 @@ class ChessGame:
                         # Start the new current player's clock
                         self.time_clocks[self.current_player].start()
                         
+                        self.update_position_stats()
+                        
+                        # Send the move and clocks to any spectators
+                        if self.broadcast:
+                            self.broadcast.publish_move(move)
+                        
                         # Check for checkmate
                         if self.board.is_checkmate(self.current_player):
                             self.game_over = True
@@ -85,16 +118,24 @@ class ChessGame:
                             # Stop all clocks when game is over
                             self.time_clocks["white"].stop()
                             self.time_clocks["black"].stop()
+                            # Let spectators know the clocks have stopped
+                            if self.broadcast:
+                                self.broadcast.publish_clocks()
                             
                     # Reset selection
                     self.selected_piece = None
-                    self.available_moves = []
+                    self.available_moves.clear()
                 else:
                     # Check if there's a piece at the clicked position
                     piece = self.board.get_piece(row, col)
                     if piece and piece.color == self.current_player:
                         self.selected_piece = (row, col)
-                        self.available_moves = self.board.get_valid_moves(row, col)
+                        self.board.generate_valid_moves(row, col, self.available_moves)
+    
+    def update_position_stats(self):
+        """Look up the current position in the position index"""
+        if self.position_index:
+            self.position_stats = self.position_index.stats(self.board)
     
     def update(self):
         """Update game state"""
@@ -111,6 +152,22 @@ class ChessGame:
                         # Stop all clocks when game is over
                         self.time_clocks["white"].stop()
                         self.time_clocks["black"].stop()
+                        # Show spectators the time forfeit
+                        if self.broadcast:
+                            self.broadcast.publish_clocks()
+            
+            # Keep spectators' clocks running between moves
+            if not self.game_over:
+                self.broadcast_clocks()
+    
+    def broadcast_clocks(self):
+        """Send the clocks to spectators whenever a whole second has passed"""
+        if not self.broadcast:
+            return
+        seconds = (int(self.time_clocks["white"].time_left), int(self.time_clocks["black"].time_left))
+        if seconds != self.broadcast_clock_seconds:
+            self.broadcast_clock_seconds = seconds
+            self.broadcast.publish_clocks()
     
     def render(self):
         """Render the game"""
@@ -120,13 +177,18 @@ class ChessGame:
         # Draw chess board
         self.board.draw(self.screen)
         
+        # Highlight squares attacked by the opponent
+        if self.show_attacks:
+            self.draw_attacked_squares()
+        
         # Highlight selected piece and available moves
         if self.selected_piece:
             row, col = self.selected_piece
             self.board.highlight_square(self.screen, row, col, (0, 255, 0, 100))  # Green for selected
             
             # Highlight available moves
-            for move_row, move_col in self.available_moves:
+            for move in self.available_moves:
+                move_row, move_col = move_to(move)
                 self.board.highlight_square(self.screen, move_row, move_col, (0, 0, 255, 100))  # Blue for moves
         
         # Draw time clocks - reversed order (black on top, white on bottom)
@@ -134,21 +196,48 @@ class ChessGame:
         self.time_clocks["white"].draw(self.screen, (self.screen_width - 200, self.screen_height - 100))
         
         # Draw current player indicator
-        font = pygame.font.SysFont("Arial", 24)
+        font = get_font("Arial", 24)
         text = font.render(f"Current Player: {self.current_player.capitalize()}", True, (0, 0, 0))
         self.screen.blit(text, (50, 20))
         
+        # Draw how often the position was seen in indexed games
+        if self.position_stats:
+            self.draw_position_stats()
+        
         # Draw game over message if applicable
         if self.game_over:
             self.draw_game_over_message()
     
+    def draw_attacked_squares(self):
+        """Shade every square the opponent attacks, darker for more attackers"""
+        opponent = "black" if self.current_player == "white" else "white"
+        attack_map = self.board.attack_maps[opponent]
+        red, green, blue, alpha = ATTACK_HIGHLIGHT
+        for row in range(self.board.rows):
+            for col in range(self.board.cols):
+                count = attack_map[row][col]
+                if count:
+                    self.board.highlight_square(self.screen, row, col, (red, green, blue, min(255, alpha * count)))
+    
+    def draw_position_stats(self):
+        """Draw the "seen in games" statistics beside the board"""
+        font = get_font("Arial", 16)
+        stats = self.position_stats
+        lines = [
+            f"Seen in {stats['games']} games",
+            f"White {stats['white_wins']}  Draw {stats['draws']}  Black {stats['black_wins']}"
+        ]
+        for index, line in enumerate(lines):
+            text = font.render(line, True, (0, 0, 0))
+            self.screen.blit(text, (self.screen_width - 230, 260 + index * 22))
+    
     def draw_game_over_message(self):
         """Draw game over message"""
         overlay = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
         overlay.fill((0, 0, 0, 128))
         self.screen.blit(overlay, (0, 0))
         
-        font = pygame.font.SysFont("Arial", 48)
+        font = get_font("Arial", 48)
         if self.winner:
             text = font.render(f"{self.winner.capitalize()} wins!", True, (255, 255, 255))
         else:
@@ -1,5 +1,10 @@
 import pygame
 import os
+from move_encoding import (MoveList, encode_move, move_to, FLAG_QUIET, FLAG_CAPTURE, FLAG_DOUBLE_PAWN_PUSH,
+                           FLAG_EN_PASSANT, FLAG_PROMOTION, FLAG_KINGSIDE_CASTLE, FLAG_QUEENSIDE_CASTLE)
+
+# Resources live next to this file, whatever the working directory is
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "res")
 
 # Load piece images
 def load_images():
@@ -10,7 +15,7 @@ def load_images():
     for color in colors:
         for piece_type in piece_types:
             # Try to load from res/chess_piece folder
-            image_path = os.path.join("res", "chess_piece", f"{color}{piece_type}.png")
+            image_path = os.path.join(RESOURCE_DIR, "chess_piece", f"{color}{piece_type}.png")
             if os.path.exists(image_path):
                 try:
                     image = pygame.image.load(image_path)
@@ -25,6 +30,44 @@ def load_images():
 # Global piece images dictionary
 PIECE_IMAGES = None
 
+# Piece images already scaled to a square size, keyed by (image key, square size)
+SCALED_IMAGES = {}
+
+# Fonts by (name, size, bold); creating a SysFont is slow, so each is made once
+FONTS = {}
+
+def get_font(name, size, bold=False):
+    """Return a cached pygame SysFont"""
+    key = (name, size, bold)
+    if key not in FONTS:
+        FONTS[key] = pygame.font.SysFont(name, size, bold=bold)
+    return FONTS[key]
+
+def get_scaled_image(image_key, square_size):
+    """Return a piece image scaled to fit a square, or None if there is no image"""
+    global PIECE_IMAGES
+    
+    cache_key = (image_key, square_size)
+    if cache_key not in SCALED_IMAGES:
+        # Initialize images if not already done
+        if PIECE_IMAGES is None:
+            PIECE_IMAGES = load_images()
+        image = PIECE_IMAGES.get(image_key)
+        if image:
+            image = pygame.transform.scale(image, (square_size - 10, square_size - 10))
+        SCALED_IMAGES[cache_key] = image
+    return SCALED_IMAGES[cache_key]
+
+def build_sprite_atlas(square_size):
+    """Scale every piece image for a square size up front and return them by image key"""
+    return {f"{color}{piece_type}": get_scaled_image(f"{color}{piece_type}", square_size)
+            for color in "wb" for piece_type in "prnbqk"}
+
+# Movement directions shared by move and attack generation
+ROOK_DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+
 class Piece:
     """Base class for all chess pieces"""
     def __init__(self, color, row, col):
@@ -36,12 +79,6 @@ class Piece:
     
     def draw(self, screen, x, y, square_size):
         """Draw the piece on the screen"""
-        global PIECE_IMAGES
-        
-        # Initialize images if not already done
-        if PIECE_IMAGES is None:
-            PIECE_IMAGES = load_images()
-        
         # Convert the color to single letter code
         color_code = "w" if self.color == "white" else "b"
         # Convert the piece type to single letter code
@@ -49,11 +86,10 @@ class Piece:
         piece_code = piece_codes.get(self.piece_type, "p")
         
         image_key = f"{color_code}{piece_code}"
-        image = PIECE_IMAGES.get(image_key)
+        # Image resized to fit the square
+        resized_image = get_scaled_image(image_key, square_size)
         
-        if image:
-            # Resize image to fit the square
-            resized_image = pygame.transform.scale(image, (square_size - 10, square_size - 10))
+        if resized_image:
             screen.blit(resized_image, (x + 5, y + 5))
         else:
             # Fallback to drawing a circle with a letter
@@ -67,45 +103,105 @@ class Piece:
                               square_size // 2 - 10, 2)
             
             # Draw piece letter
-            font = pygame.font.SysFont("Arial", 20, bold=True)
+            font = get_font("Arial", 20, bold=True)
             text = font.render(self.piece_type[0].upper(), True, border_color)
             text_rect = text.get_rect(center=(x + square_size // 2, y + square_size // 2))
             screen.blit(text, text_rect)
     
     def get_possible_moves(self, board, check_king_safety=True):
-        """Get all possible moves for this piece"""
+        """Get all possible moves for this piece as (row, col) destinations"""
+        moves = MoveList()
+        self.generate_moves(board, moves, check_king_safety)
+        return [move_to(move) for move in moves]
+    
+    def generate_moves(self, board, moves, check_king_safety=True):
+        """Append all possible moves for this piece to a MoveList as encoded moves"""
+        # To be implemented by subclasses
+        pass
+    
+    def generate_sliding_moves(self, board, moves, directions):
+        """Append moves along each direction until the edge of the board or the first piece"""
+        for dr, dc in directions:
+            new_row, new_col = self.row + dr, self.col + dc
+            while 0 <= new_row < 8 and 0 <= new_col < 8:
+                piece = board.board[new_row][new_col]
+                if piece is None:
+                    moves.append(encode_move(self.row, self.col, new_row, new_col, FLAG_QUIET))
+                else:
+                    if piece.color != self.color:
+                        moves.append(encode_move(self.row, self.col, new_row, new_col, FLAG_CAPTURE))
+                    break
+                new_row += dr
+                new_col += dc
+    
+    def generate_step_moves(self, board, moves, offsets):
+        """Append single step moves along each offset"""
+        for dr, dc in offsets:
+            new_row, new_col = self.row + dr, self.col + dc
+            if 0 <= new_row < 8 and 0 <= new_col < 8:
+                piece = board.board[new_row][new_col]
+                if piece is None:
+                    moves.append(encode_move(self.row, self.col, new_row, new_col, FLAG_QUIET))
+                elif piece.color != self.color:
+                    moves.append(encode_move(self.row, self.col, new_row, new_col, FLAG_CAPTURE))
+    
+    def get_attacked_squares(self, board):
+        """Get all squares this piece attacks, including squares held by its own side"""
         # To be implemented by subclasses
         return []
+    
+    def get_sliding_attacks(self, board, directions):
+        """Follow each direction until the edge of the board or the first piece"""
+        squares = []
+        for dr, dc in directions:
+            new_row, new_col = self.row + dr, self.col + dc
+            while 0 <= new_row < 8 and 0 <= new_col < 8:
+                squares.append((new_row, new_col))
+                if board.board[new_row][new_col] is not None:
+                    break
+                new_row += dr
+                new_col += dc
+        return squares
+    
+    def get_step_attacks(self, offsets):
+        """Squares reached by a single step along each offset"""
+        squares = []
+        for dr, dc in offsets:
+            new_row, new_col = self.row + dr, self.col + dc
+            if 0 <= new_row < 8 and 0 <= new_col < 8:
+                squares.append((new_row, new_col))
+        return squares
 
 class Pawn(Piece):
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
         self.piece_type = "pawn"
     
-    def get_possible_moves(self, board, check_king_safety=True):
-        moves = []
+    def generate_moves(self, board, moves, check_king_safety=True):
         direction = -1 if self.color == "white" else 1  # White moves up, black moves down
+        new_row = self.row + direction
+        if not 0 <= new_row < 8:
+            return
+        # Reaching the last rank promotes to a queen
+        promotion = FLAG_PROMOTION if new_row == 0 or new_row == 7 else 0
         
         # Forward move
-        new_row = self.row + direction
-        if board.is_valid_position(new_row, self.col) and board.get_piece(new_row, self.col) is None:
-            moves.append((new_row, self.col))
+        if board.board[new_row][self.col] is None:
+            moves.append(encode_move(self.row, self.col, new_row, self.col, FLAG_QUIET | promotion))
             
             # Double move from starting position
             if not self.has_moved:
-                new_row = self.row + 2 * direction
-                if board.is_valid_position(new_row, self.col) and board.get_piece(new_row, self.col) is None:
-                    moves.append((new_row, self.col))
+                double_row = self.row + 2 * direction
+                if 0 <= double_row < 8 and board.board[double_row][self.col] is None:
+                    moves.append(encode_move(self.row, self.col, double_row, self.col, FLAG_DOUBLE_PAWN_PUSH))
         
         # Capture diagonally
         for col_offset in [-1, 1]:
             new_col = self.col + col_offset
-            new_row = self.row + direction
-            
-            if board.is_valid_position(new_row, new_col):
-                piece = board.get_piece(new_row, new_col)
+            if 0 <= new_col < 8:
+                piece = board.board[new_row][new_col]
                 if piece and piece.color != self.color:
-                    moves.append((new_row, new_col))
+                    moves.append(encode_move(self.row, self.col, new_row, new_col, FLAG_CAPTURE | promotion))
         
         # En passant
         if board.en_passant_target:
@@ -116,142 +212,72 @@ class Pawn(Piece):
                 correct_rank = 3 if self.color == "white" else 4
                 if self.row == correct_rank:
                     # En passant capture square (diagonal to the target pawn)
-                    capture_row = self.row + direction
-                    capture_col = target_col
-                    moves.append((capture_row, capture_col))
-                
-        return moves
+                    moves.append(encode_move(self.row, self.col, new_row, target_col, FLAG_EN_PASSANT))
+    
+    def get_attacked_squares(self, board):
+        # Pawns only attack diagonally forward
+        direction = -1 if self.color == "white" else 1
+        return self.get_step_attacks([(direction, -1), (direction, 1)])
 
 class Rook(Piece):
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
         self.piece_type = "rook"
     
-    def get_possible_moves(self, board, check_king_safety=True):
-        moves = []
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]  # Right, down, left, up
-        
-        for dr, dc in directions:
-            for i in range(1, 8):  # Maximum 7 squares in any direction
-                new_row, new_col = self.row + i * dr, self.col + i * dc
-                
-                if not board.is_valid_position(new_row, new_col):
-                    break
-                
-                piece = board.get_piece(new_row, new_col)
-                if piece is None:
-                    moves.append((new_row, new_col))
-                elif piece.color != self.color:
-                    moves.append((new_row, new_col))
-                    break
-                else:
-                    break
-        
-        return moves
+    def generate_moves(self, board, moves, check_king_safety=True):
+        self.generate_sliding_moves(board, moves, ROOK_DIRECTIONS)
+    
+    def get_attacked_squares(self, board):
+        return self.get_sliding_attacks(board, ROOK_DIRECTIONS)
 
 class Knight(Piece):
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
         self.piece_type = "knight"
     
-    def get_possible_moves(self, board, check_king_safety=True):
-        moves = []
+    def generate_moves(self, board, moves, check_king_safety=True):
         # All possible L-shaped moves
-        knight_moves = [
-            (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-            (1, -2), (1, 2), (2, -1), (2, 1)
-        ]
-        
-        for dr, dc in knight_moves:
-            new_row, new_col = self.row + dr, self.col + dc
-            
-            if board.is_valid_position(new_row, new_col):
-                piece = board.get_piece(new_row, new_col)
-                if piece is None or piece.color != self.color:
-                    moves.append((new_row, new_col))
-        
-        return moves
+        self.generate_step_moves(board, moves, KNIGHT_OFFSETS)
+    
+    def get_attacked_squares(self, board):
+        return self.get_step_attacks(KNIGHT_OFFSETS)
 
 class Bishop(Piece):
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
         self.piece_type = "bishop"
     
-    def get_possible_moves(self, board, check_king_safety=True):
-        moves = []
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]  # Diagonals
-        
-        for dr, dc in directions:
-            for i in range(1, 8):  # Maximum 7 squares in any direction
-                new_row, new_col = self.row + i * dr, self.col + i * dc
-                
-                if not board.is_valid_position(new_row, new_col):
-                    break
-                
-                piece = board.get_piece(new_row, new_col)
-                if piece is None:
-                    moves.append((new_row, new_col))
-                elif piece.color != self.color:
-                    moves.append((new_row, new_col))
-                    break
-                else:
-                    break
-        
-        return moves
+    def generate_moves(self, board, moves, check_king_safety=True):
+        self.generate_sliding_moves(board, moves, BISHOP_DIRECTIONS)
+    
+    def get_attacked_squares(self, board):
+        return self.get_sliding_attacks(board, BISHOP_DIRECTIONS)
 
 class Queen(Piece):
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
         self.piece_type = "queen"
     
-    def get_possible_moves(self, board, check_king_safety=True):
-        moves = []
+    def generate_moves(self, board, moves, check_king_safety=True):
         # Queen can move like a rook and a bishop combined
-        directions = [
-            (0, 1), (1, 0), (0, -1), (-1, 0),  # Horizontal and vertical
-            (1, 1), (1, -1), (-1, 1), (-1, -1)  # Diagonals
-        ]
-        
-        for dr, dc in directions:
-            for i in range(1, 8):  # Maximum 7 squares in any direction
-                new_row, new_col = self.row + i * dr, self.col + i * dc
-                
-                if not board.is_valid_position(new_row, new_col):
-                    break
-                
-                piece = board.get_piece(new_row, new_col)
-                if piece is None:
-                    moves.append((new_row, new_col))
-                elif piece.color != self.color:
-                    moves.append((new_row, new_col))
-                    break
-                else:
-                    break
-        
-        return moves
+        self.generate_sliding_moves(board, moves, ROOK_DIRECTIONS + BISHOP_DIRECTIONS)
+    
+    def get_attacked_squares(self, board):
+        return self.get_sliding_attacks(board, ROOK_DIRECTIONS + BISHOP_DIRECTIONS)
 
 class King(Piece):
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
         self.piece_type = "king"
     
-    def get_possible_moves(self, board, check_king_safety=True):
-        moves = []
+    def generate_moves(self, board, moves, check_king_safety=True):
         # King can move one square in any direction
-        directions = [
-            (0, 1), (1, 0), (0, -1), (-1, 0),  # Horizontal and vertical
-            (1, 1), (1, -1), (-1, 1), (-1, -1)  # Diagonals
-        ]
-        
-        for dr, dc in directions:
-            new_row, new_col = self.row + dr, self.col + dc
-            
-            if board.is_valid_position(new_row, new_col):
-                piece = board.get_piece(new_row, new_col)
-                if piece is None or piece.color != self.color:
-                    moves.append((new_row, new_col))
+        self.generate_step_moves(board, moves, ROOK_DIRECTIONS + BISHOP_DIRECTIONS)
         
         # Castling logic
+        # With the king out of check, nothing it blocks can reach the squares it passes, so the
+        # opponent's attack map is exact for them
+        attack_map = board.attack_maps["black" if self.color == "white" else "white"]
         if not check_king_safety or not self.has_moved and not board.is_in_check(self.color):
             # Kingside castling
             if board.castling_rights[self.color]["kingside"]:
@@ -259,12 +285,9 @@ class King(Piece):
                     rook = board.get_piece(self.row, 7)
                     if rook and rook.piece_type == "rook" and not rook.has_moved:
                         # Check if squares in between are not under attack
-                        if check_king_safety:
-                            if not any(board.would_be_in_check_after_move(self.row, self.col, self.row, c, self.color) 
-                                    for c in range(self.col + 1, self.col + 3)):
-                                moves.append((self.row, self.col + 2))
-                        else:
-                            moves.append((self.row, self.col + 2))
+                        if not check_king_safety or not any(attack_map[self.row][c] for c in range(self.col + 1, self.col + 3)):
+                            moves.append(encode_move(self.row, self.col, self.row, self.col + 2,
+                                                     FLAG_KINGSIDE_CASTLE))
             
             # Queenside castling
             if board.castling_rights[self.color]["queenside"]:
@@ -272,11 +295,10 @@ class King(Piece):
                     rook = board.get_piece(self.row, 0)
                     if rook and rook.piece_type == "rook" and not rook.has_moved:
                         # Check if squares in between are not under attack
-                        if check_king_safety:
-                            if not any(board.would_be_in_check_after_move(self.row, self.col, self.row, c, self.color) 
-                                    for c in range(self.col - 1, self.col - 3, -1)):
-                                moves.append((self.row, self.col - 2))
-                        else:
-                            moves.append((self.row, self.col - 2))
-        
-        return moves 
\ No newline at end of file
+                        if not check_king_safety or not any(attack_map[self.row][c] for c in range(self.col - 1, self.col - 3, -1)):
+                            moves.append(encode_move(self.row, self.col, self.row, self.col - 2,
+                                                     FLAG_QUEENSIDE_CASTLE))
+    
+    def get_attacked_squares(self, board):
+        # Castling never attacks anything, so only the adjacent squares count
+        return self.get_step_attacks(ROOK_DIRECTIONS + BISHOP_DIRECTIONS)
@@ -19,7 +19,14 @@ DARK_SQUARE = (181, 136, 99)    # Dark brown
 HIGHLIGHT_COLOR = (255, 255, 0, 100)  # Yellow with transparency
 MOVE_HIGHLIGHT = (0, 0, 255, 100)  # Blue with transparency
 SELECTED_HIGHLIGHT = (0, 255, 0, 100)  # Green with transparency
+ATTACK_HIGHLIGHT = (255, 0, 0, 50)  # Red with transparency, stronger per extra attacker
 BACKGROUND_COLOR = (240, 240, 240)  # Light gray
 
 # Game settings
-DEFAULT_TIME_MINUTES = 10  # 10 minutes per player 
\ No newline at end of file
+DEFAULT_TIME_MINUTES = 10  # 10 minutes per player 
+
+# History settings
+HISTORY_CHECKPOINT_INTERVAL = 16  # Full board snapshot every 16 plies
+
+# Analysis settings
+POSITION_INDEX_PATH = None  # Index built with position_index.py; shows "seen in games" stats when set
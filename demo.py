@@ -2,6 +2,7 @@ import pygame
 import sys
 from chess_game import ChessGame
 from chess_board import ChessBoard
+from game_history import GameHistory
 from chess_pieces import Pawn, Rook, Knight, Bishop, Queen, King
 from config import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, TITLE
 
@@ -18,7 +19,7 @@ def setup_demo_board(board):
     board.board[6][5] = Pawn("white", 6, 5)
     board.board[6][6] = Pawn("white", 6, 6)
     board.board[6][7] = Pawn("white", 6, 7)
-    board.board[5][3] = Queen("white", 5, 3)
+    board.board[1][1] = Queen("white", 1, 1)
     
     # Black pieces
     board.board[0][4] = King("black", 0, 4)
@@ -36,6 +37,12 @@ def setup_demo_board(board):
             piece = board.get_piece(row, col)
             if piece:
                 piece.has_moved = True
+    for color in ("white", "black"):
+        board.castling_rights[color] = {"kingside": False, "queenside": False}
+    
+    # The board was edited directly, so recompute the attack maps and evaluation
+    board.rebuild_attack_maps()
+    board.recompute_evaluation()
 
 def main():
     """Run a chess game demo"""
@@ -51,6 +58,8 @@ def main():
     
     # Set up demo board
     setup_demo_board(game.board)
+    game.history = GameHistory(game.board)
+    game.update_position_stats()
     
     # Show a message for the demo
     font = pygame.font.SysFont("Arial", 16)
@@ -0,0 +1,107 @@
+"""Static evaluation terms.
+
+ChessBoard keeps the totals of these terms up to date as moves are made and
+taken back, so scoring a position does not have to look at every square:
+
+- material, in centipawns
+- piece-square tables, a bonus or penalty for each piece on each square
+- pawn structure, penalties for doubled and isolated pawns, worked out from
+  the number of pawns of each color on each file
+
+All totals are from white's point of view (positive is good for white).
+"""
+
+PIECE_VALUES = {"pawn": 100, "knight": 320, "bishop": 330, "rook": 500, "queen": 900, "king": 0}
+
+DOUBLED_PAWN_PENALTY = 15  # For every pawn beyond the first on a file
+ISOLATED_PAWN_PENALTY = 12  # For every pawn without friendly pawns on the neighbouring files
+
+# Piece-square tables for white, indexed [row][col] like ChessBoard.board
+# (row 0 is the eighth rank). Black uses the same tables mirrored vertically.
+PIECE_SQUARE_TABLES = {
+    "pawn": [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [10, 10, 20, 30, 30, 20, 10, 10],
+        [5, 5, 10, 25, 25, 10, 5, 5],
+        [0, 0, 0, 20, 20, 0, 0, 0],
+        [5, -5, -10, 0, 0, -10, -5, 5],
+        [5, 10, 10, -20, -20, 10, 10, 5],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    "knight": [
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+        [-40, -20, 0, 0, 0, 0, -20, -40],
+        [-30, 0, 10, 15, 15, 10, 0, -30],
+        [-30, 5, 15, 20, 20, 15, 5, -30],
+        [-30, 0, 15, 20, 20, 15, 0, -30],
+        [-30, 5, 10, 15, 15, 10, 5, -30],
+        [-40, -20, 0, 5, 5, 0, -20, -40],
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+    ],
+    "bishop": [
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 10, 10, 5, 0, -10],
+        [-10, 5, 5, 10, 10, 5, 5, -10],
+        [-10, 0, 10, 10, 10, 10, 0, -10],
+        [-10, 10, 10, 10, 10, 10, 10, -10],
+        [-10, 5, 0, 0, 0, 0, 5, -10],
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+    ],
+    "rook": [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [5, 10, 10, 10, 10, 10, 10, 5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [0, 0, 0, 5, 5, 0, 0, 0],
+    ],
+    "queen": [
+        [-20, -10, -10, -5, -5, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 5, 5, 5, 0, -10],
+        [-5, 0, 5, 5, 5, 5, 0, -5],
+        [0, 0, 5, 5, 5, 5, 0, -5],
+        [-10, 5, 5, 5, 5, 5, 0, -10],
+        [-10, 0, 5, 0, 0, 0, 0, -10],
+        [-20, -10, -10, -5, -5, -10, -10, -20],
+    ],
+    "king": [
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-20, -30, -30, -40, -40, -30, -30, -20],
+        [-10, -20, -20, -20, -20, -20, -20, -10],
+        [20, 20, 0, 0, 0, 0, 20, 20],
+        [20, 30, 10, 0, 0, 10, 30, 20],
+    ],
+}
+
+def piece_square_value(piece_type, color, row, col):
+    """Piece-square table entry for a piece, from its own side's point of view"""
+    table = PIECE_SQUARE_TABLES[piece_type]
+    return table[row][col] if color == "white" else table[7 - row][col]
+
+def pawn_file_penalty(pawn_files, col):
+    """Doubled and isolated pawn penalty for one color's pawns on one file"""
+    count = pawn_files[col]
+    if not count:
+        return 0
+    penalty = DOUBLED_PAWN_PENALTY * (count - 1)
+    left = pawn_files[col - 1] if col > 0 else 0
+    right = pawn_files[col + 1] if col < len(pawn_files) - 1 else 0
+    if not left and not right:
+        penalty += ISOLATED_PAWN_PENALTY * count
+    return penalty
+
+def pawn_structure_score(pawn_files):
+    """Pawn structure total, from white's point of view, for per-file pawn counts"""
+    score = 0
+    for col in range(len(pawn_files["white"])):
+        score -= pawn_file_penalty(pawn_files["white"], col)
+        score += pawn_file_penalty(pawn_files["black"], col)
+    return score
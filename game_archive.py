@@ -0,0 +1,500 @@
+"""Block-compressed game archive with random access.
+
+Stores completed games far more compactly than PGN:
+
+- every move is stored as one byte, its index in the sorted list of valid
+  moves of the position it is played in
+- games are grouped into blocks, and each block stores its headers column
+  by column (all Event values, then all Site values, ...) followed by the
+  ply counts and the move bytes, so similar values sit next to each other
+- every block is compressed on its own with zlib
+
+    header | compressed blocks | block index
+
+The block index holds the offset, size, first game and game count of each
+block, so reading game N only decompresses the block that contains it, and
+headers can be scanned without replaying any moves. Games may start from a
+FEN position (the FEN header). PGN games with underpromotions are skipped;
+see ChessBoard.parse_uci_move for how promotions work in this game.
+
+    python game_archive.py convert games.pgn games.arc
+    python game_archive.py convert games.txt games.arc --format corpus
+    python game_archive.py info games.arc
+    python game_archive.py show games.arc 0 42
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import bisect
+import re
+import struct
+import sys
+import time
+import zlib
+from multiprocessing import Pool
+
+from chess_board import ChessBoard, parse_square, square_name
+from move_encoding import (MoveList, move_from, move_to, move_flag, is_capture, is_promotion, move_to_uci,
+                           FLAG_KINGSIDE_CASTLE, FLAG_QUEENSIDE_CASTLE)
+
+MAGIC = b"CHESSARC"
+HEADER_FORMAT = "<8sQIQ"  # magic, game count, block count, block index offset
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+INDEX_FORMAT = "<QIQI"  # block offset, compressed size, first game, game count
+INDEX_SIZE = struct.calcsize(INDEX_FORMAT)
+
+GAMES_PER_BLOCK = 1000
+COMPRESSION_LEVEL = 9
+
+# Header columns stored for every game; other headers go into one extra column
+HEADER_TAGS = ("Event", "Site", "Date", "Round", "White", "Black", "Result", "FEN")
+
+SAN_PATTERN = re.compile(r"([KQRBN])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([QRBN]))?")
+SAN_PIECES = {"K": "king", "Q": "queen", "R": "rook", "B": "bishop", "N": "knight"}
+SAN_LETTERS = {piece_type: letter for letter, piece_type in SAN_PIECES.items()}
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+class UnsupportedMove(ValueError):
+    """A legal chess move the board cannot play, i.e. an underpromotion"""
+
+def start_board(headers):
+    """Board at the start of a game: the FEN header position, or the initial position"""
+    board = ChessBoard()
+    if headers.get("FEN"):
+        board.load_fen(headers["FEN"])
+    return board
+
+def sorted_moves(board, moves):
+    """Valid moves of the side to move in a fixed order (by encoded value)"""
+    board.generate_all_valid_moves(board.turn, moves)
+    return sorted(moves.to_list())
+
+def encode_moves(headers, uci_moves):
+    """Replay UCI moves and return them as one index byte per ply"""
+    board = start_board(headers)
+    moves = MoveList()
+    indices = bytearray()
+    for ply, text in enumerate(uci_moves, 1):
+        try:
+            move = board.parse_uci_move(text, moves)
+        except ValueError as error:
+            raise ValueError(f"{error} at ply {ply}")
+        # parse_uci_move leaves the valid moves in the list
+        indices.append(sorted(moves.to_list()).index(move))
+        board.make_move(move)
+    return bytes(indices)
+
+def decode_moves(headers, indices):
+    """Replay index bytes and return the encoded moves"""
+    board = start_board(headers)
+    moves = MoveList()
+    line = []
+    for index in indices:
+        move = sorted_moves(board, moves)[index]
+        line.append(move)
+        board.make_move(move)
+    return line
+
+def san_to_move(board, san, moves):
+    """Return the valid encoded move for a SAN move like Nbd7, exd6 or e8=Q"""
+    text = san.rstrip("+#!?")
+    board.generate_all_valid_moves(board.turn, moves)
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        flag = FLAG_KINGSIDE_CASTLE if len(text) == 3 else FLAG_QUEENSIDE_CASTLE
+        for move in moves:
+            if move_flag(move) == flag:
+                return move
+        raise ValueError(f"illegal move {san}")
+
+    match = SAN_PATTERN.fullmatch(text)
+    if not match:
+        raise ValueError(f"invalid SAN move {san!r}")
+    piece_letter, from_file, from_rank, target, promotion = match.groups()
+    if promotion and promotion != "Q":
+        raise UnsupportedMove(f"underpromotion {san}")
+    piece_type = SAN_PIECES[piece_letter] if piece_letter else "pawn"
+    to_square = parse_square(target)
+
+    candidates = []
+    for move in moves:
+        from_row, from_col = move_from(move)
+        if move_to(move) != to_square or board.board[from_row][from_col].piece_type != piece_type:
+            continue
+        name = square_name(from_row, from_col)
+        if (from_file and name[0] != from_file) or (from_rank and name[1] != from_rank):
+            continue
+        candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError(f"{'ambiguous' if candidates else 'illegal'} move {san}")
+    return candidates[0]
+
+def move_to_san(board, move, moves):
+    """Format a valid encoded move in SAN; moves is a spare MoveList"""
+    from_row, from_col = move_from(move)
+    to_row, to_col = move_to(move)
+    piece = board.board[from_row][from_col]
+    flag = move_flag(move)
+    if flag == FLAG_KINGSIDE_CASTLE:
+        text = "O-O"
+    elif flag == FLAG_QUEENSIDE_CASTLE:
+        text = "O-O-O"
+    elif piece.piece_type == "pawn":
+        text = square_name(from_row, from_col)[0] + "x" if is_capture(move) else ""
+        text += square_name(to_row, to_col) + ("=Q" if is_promotion(move) else "")
+    else:
+        # Disambiguate between pieces of the same type that can reach the same square
+        board.generate_all_valid_moves(board.turn, moves)
+        rivals = []
+        for other in moves:
+            other_row, other_col = move_from(other)
+            if (other != move and move_to(other) == (to_row, to_col)
+                    and board.board[other_row][other_col].piece_type == piece.piece_type):
+                rivals.append((other_row, other_col))
+        name = square_name(from_row, from_col)
+        disambiguation = ""
+        if rivals:
+            if all(col != from_col for _, col in rivals):
+                disambiguation = name[0]
+            elif all(row != from_row for row, _ in rivals):
+                disambiguation = name[1]
+            else:
+                disambiguation = name
+        text = SAN_LETTERS[piece.piece_type] + disambiguation + ("x" if is_capture(move) else "")
+        text += square_name(to_row, to_col)
+
+    record = board.make_move(move)
+    if board.is_in_check(board.turn):
+        board.generate_all_valid_moves(board.turn, moves)
+        text += "+" if moves else "#"
+    board.undo_move(record)
+    return text
+
+def read_pgn_games(stream):
+    """Yield the text of each game in a PGN stream"""
+    lines = []
+    in_moves = False
+    for line in stream:
+        if line.startswith("[") and in_moves:
+            yield "".join(lines)
+            lines = []
+            in_moves = False
+        elif line.strip() and not line.startswith("["):
+            in_moves = True
+        lines.append(line)
+    if any(line.strip() for line in lines):
+        yield "".join(lines)
+
+def parse_pgn_game(text):
+    """Split one PGN game into (headers, SAN moves)"""
+    headers = {}
+    movetext = []
+    for line in text.splitlines():
+        tag = re.match(r'\s*\[(\w+)\s+"(.*)"\s*\]\s*$', line)
+        if tag:
+            headers[tag.group(1)] = tag.group(2).replace('\\"', '"')
+        elif not line.startswith("%"):
+            movetext.append(line)
+    movetext = " ".join(movetext)
+
+    # Drop comments, variations and annotation glyphs
+    movetext = re.sub(r"\{[^}]*\}|;[^\n]*|\$\d+", " ", movetext)
+    depth = 0
+    kept = []
+    for char in movetext:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        elif not depth:
+            kept.append(char)
+
+    sans = []
+    for token in "".join(kept).split():
+        token = re.sub(r"^\d+\.+", "", token)
+        if not token:
+            continue
+        if token in RESULTS:
+            headers.setdefault("Result", token)
+            break
+        sans.append(token)
+    return headers, sans
+
+def convert_pgn_game(text):
+    """PGN game text to (headers, index bytes); raises ValueError for games that cannot be stored"""
+    headers, sans = parse_pgn_game(text)
+    board = start_board(headers)
+    moves = MoveList()
+    indices = bytearray()
+    for san in sans:
+        move = san_to_move(board, san, moves)
+        # san_to_move leaves the valid moves in the list
+        indices.append(sorted(moves.to_list()).index(move))
+        board.make_move(move)
+    return headers, bytes(indices)
+
+def convert_corpus_line(line):
+    """A 'result move move ...' corpus line (as written by self_play.py --output) to (headers, index bytes)"""
+    fields = line.split()
+    headers = {"Result": fields[0]}
+    return headers, encode_moves(headers, fields[1:])
+
+def _convert_task(args):
+    """Pool entry point: (headers, index bytes), or the error message for a skipped game"""
+    converter, text = args
+    try:
+        return converter(text)
+    except ValueError as error:
+        return str(error)
+
+def _clean(value):
+    # Newlines and tabs separate values inside the columns
+    return value.replace("\n", " ").replace("\t", " ")
+
+def encode_block(games, level=COMPRESSION_LEVEL):
+    """Compress a list of (headers, index bytes) games into one block"""
+    columns = []
+    for tag in HEADER_TAGS:
+        columns.append("\n".join(_clean(headers.get(tag, "")) for headers, _ in games).encode("utf-8"))
+    extra = ("\t".join(f"{_clean(key)}\t{_clean(value)}" for key, value in headers.items() if key not in HEADER_TAGS)
+             for headers, _ in games)
+    columns.append("\n".join(extra).encode("utf-8"))
+    columns.append(struct.pack(f"<{len(games)}H", *(len(indices) for _, indices in games)))
+    columns.append(b"".join(indices for _, indices in games))
+
+    payload = [struct.pack("<I", len(games))]
+    for column in columns:
+        payload.append(struct.pack("<I", len(column)))
+        payload.append(column)
+    return zlib.compress(b"".join(payload), level)
+
+def decode_block(data):
+    """Decompress a block into (list of header dicts, list of index bytes)"""
+    payload = zlib.decompress(data)
+    count, = struct.unpack_from("<I", payload, 0)
+    offset = 4
+    columns = []
+    for _ in range(len(HEADER_TAGS) + 3):
+        length, = struct.unpack_from("<I", payload, offset)
+        columns.append(payload[offset + 4:offset + 4 + length])
+        offset += 4 + length
+
+    headers = [{} for _ in range(count)]
+    for tag, column in zip(HEADER_TAGS, columns):
+        for game_headers, value in zip(headers, column.decode("utf-8").split("\n")):
+            if value:
+                game_headers[tag] = value
+    for game_headers, extra in zip(headers, columns[len(HEADER_TAGS)].decode("utf-8").split("\n")):
+        fields = extra.split("\t") if extra else []
+        game_headers.update(zip(fields[0::2], fields[1::2]))
+
+    plies = struct.unpack(f"<{count}H", columns[-2])
+    move_bytes = columns[-1]
+    games_moves = []
+    start = 0
+    for ply_count in plies:
+        games_moves.append(move_bytes[start:start + ply_count])
+        start += ply_count
+    return headers, games_moves
+
+class GameArchiveWriter:
+    """Writes an archive file block by block"""
+    def __init__(self, path, games_per_block=GAMES_PER_BLOCK, level=COMPRESSION_LEVEL):
+        self.file = open(path, "wb")
+        self.file.write(b"\0" * HEADER_SIZE)
+        self.games_per_block = games_per_block
+        self.level = level
+        self.pending = []
+        self.index = []
+        self.count = 0
+
+    def add_game(self, headers, uci_moves):
+        """Add a game given as a header dict and UCI moves; raises ValueError if it cannot be stored"""
+        self.add_encoded(headers, encode_moves(headers, uci_moves))
+
+    def add_encoded(self, headers, indices):
+        """Add a game whose moves were already encoded with encode_moves"""
+        self.pending.append((headers, indices))
+        self.count += 1
+        if len(self.pending) >= self.games_per_block:
+            self.flush_block()
+
+    def flush_block(self):
+        if not self.pending:
+            return
+        data = encode_block(self.pending, self.level)
+        self.index.append((self.file.tell(), len(data), self.count - len(self.pending), len(self.pending)))
+        self.file.write(data)
+        self.pending = []
+
+    def close(self):
+        """Write the last block, the block index and the header"""
+        self.flush_block()
+        index_offset = self.file.tell()
+        self.file.write(b"".join(struct.pack(INDEX_FORMAT, *entry) for entry in self.index))
+        self.file.seek(0)
+        self.file.write(struct.pack(HEADER_FORMAT, MAGIC, self.count, len(self.index), index_offset))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class GameArchive:
+    """Reads games from an archive file by number"""
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        magic, self.count, block_count, index_offset = struct.unpack(HEADER_FORMAT, self.file.read(HEADER_SIZE))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a game archive")
+        self.file.seek(index_offset)
+        data = self.file.read(block_count * INDEX_SIZE)
+        self.index = list(struct.iter_unpack(INDEX_FORMAT, data))
+        self.first_games = [entry[2] for entry in self.index]
+        self.cached_block = None  # (block number, decoded block)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def block(self, number):
+        """Decoded (headers, index bytes) lists of one block, caching the last one read"""
+        if self.cached_block and self.cached_block[0] == number:
+            return self.cached_block[1]
+        offset, size, _, _ = self.index[number]
+        self.file.seek(offset)
+        decoded = decode_block(self.file.read(size))
+        self.cached_block = (number, decoded)
+        return decoded
+
+    def locate(self, game_id):
+        """(block number, position in the block) of a game"""
+        if not 0 <= game_id < self.count:
+            raise IndexError(f"game {game_id} is not in the archive")
+        number = bisect.bisect_right(self.first_games, game_id) - 1
+        return number, game_id - self.first_games[number]
+
+    def headers(self, game_id):
+        """Headers of a game, without replaying its moves"""
+        number, position = self.locate(game_id)
+        return self.block(number)[0][position]
+
+    def game(self, game_id):
+        """A game as {"headers": ..., "moves": [UCI moves]}"""
+        number, position = self.locate(game_id)
+        headers, games_moves = self.block(number)
+        moves = decode_moves(headers[position], games_moves[position])
+        return {"headers": headers[position], "moves": [move_to_uci(move) for move in moves]}
+
+    def iter_headers(self):
+        """Headers of every game in order, decompressing each block once"""
+        for number in range(len(self.index)):
+            yield from self.block(number)[0]
+
+    def __iter__(self):
+        for game_id in range(self.count):
+            yield self.game(game_id)
+
+def game_to_pgn(game):
+    """Format a game returned by GameArchive.game as PGN text"""
+    headers = game["headers"]
+    lines = [f'[{tag} "{value}"]' for tag, value in headers.items()]
+    board = start_board(headers)
+    moves = MoveList()
+    tokens = []
+    black_first = board.turn == "black"
+    for ply, text in enumerate(game["moves"]):
+        move = board.parse_uci_move(text, moves)
+        if board.turn == "white":
+            tokens.append(f"{(ply + black_first) // 2 + 1}.")
+        elif ply == 0:
+            tokens.append("1...")
+        tokens.append(move_to_san(board, move, moves))
+        board.make_move(move)
+    tokens.append(headers.get("Result", "*"))
+
+    movetext = []
+    line = ""
+    for token in tokens:
+        if line and len(line) + len(token) + 1 > 79:
+            movetext.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    movetext.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n"
+
+def convert(source_path, archive_path, source_format="pgn", processes=None,
+            games_per_block=GAMES_PER_BLOCK, level=COMPRESSION_LEVEL):
+    """Convert a PGN file or corpus file into an archive. Returns (games stored, games skipped)."""
+    converter = convert_pgn_game if source_format == "pgn" else convert_corpus_line
+    skipped = 0
+    with open(source_path, encoding="utf-8", errors="replace") as source:
+        if source_format == "pgn":
+            texts = read_pgn_games(source)
+        else:
+            texts = (line for line in source if line.strip())
+        tasks = ((converter, text) for text in texts)
+        with GameArchiveWriter(archive_path, games_per_block, level) as writer:
+            with Pool(processes) as pool:
+                # imap keeps the input order, so game numbers follow the source file
+                for converted in pool.imap(_convert_task, tasks, chunksize=64):
+                    if isinstance(converted, str):
+                        skipped += 1
+                        continue
+                    writer.add_encoded(*converted)
+            return writer.count, skipped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert, inspect and read block-compressed game archives.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_command = commands.add_parser("convert", help="convert a PGN or corpus file into an archive")
+    convert_command.add_argument("source")
+    convert_command.add_argument("archive")
+    convert_command.add_argument("--format", choices=("pgn", "corpus"), default="pgn",
+                                 help="corpus: one 'result move move ...' game per line")
+    convert_command.add_argument("--processes", type=int, default=None)
+    convert_command.add_argument("--games-per-block", type=int, default=GAMES_PER_BLOCK)
+    convert_command.add_argument("--level", type=int, default=COMPRESSION_LEVEL, help="zlib compression level")
+
+    info = commands.add_parser("info", help="show archive statistics")
+    info.add_argument("archive")
+
+    show = commands.add_parser("show", help="print games as PGN")
+    show.add_argument("archive")
+    show.add_argument("games", type=int, nargs="+", help="game numbers, starting at 0")
+
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        start = time.perf_counter()
+        stored, skipped = convert(args.source, args.archive, args.format, args.processes,
+                                  args.games_per_block, args.level)
+        elapsed = time.perf_counter() - start
+        source_size, archive_size = os.path.getsize(args.source), os.path.getsize(args.archive)
+        print(f"Stored {stored} games ({skipped} skipped) in {elapsed:.2f}s: "
+              f"{source_size} -> {archive_size} bytes ({archive_size / max(1, source_size):.1%})")
+        return 0
+
+    with GameArchive(args.archive) as archive:
+        if args.command == "info":
+            size = os.path.getsize(args.archive)
+            print(f"{len(archive)} games in {len(archive.index)} blocks, {size} bytes "
+                  f"({size / max(1, len(archive)):.1f} bytes per game)")
+        else:
+            for game_id in args.games:
+                print(game_to_pgn(archive.game(game_id)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+from array import array
+from config import HISTORY_CHECKPOINT_INTERVAL
+
+class GameHistory:
+    """Move history for a ChessBoard with checkpointed random-access seeking.
+
+    Every move is stored together with the MoveRecord needed to undo it, and a
+    full board snapshot is kept every checkpoint_interval plies. Seeking to any
+    ply restores the nearest earlier checkpoint and replays at most
+    checkpoint_interval - 1 moves, unless stepping from the current ply is
+    cheaper.
+    """
+    def __init__(self, board, checkpoint_interval=HISTORY_CHECKPOINT_INTERVAL):
+        self.board = board
+        self.checkpoint_interval = checkpoint_interval
+
+        # moves[i] is the encoded move (see move_encoding) of ply i + 1
+        self.moves = array("H")
+        # records[i] undoes moves[i]. Only the records from undo_from up to the
+        # current ply refer to the pieces currently on the board.
+        self.records = []
+        self.undo_from = 0
+        # checkpoints[i] is the board snapshot at ply i * checkpoint_interval
+        self.checkpoints = [board.snapshot()]
+
+        # Ply the board is currently showing
+        self.ply = 0
+
+    def __len__(self):
+        """Number of plies recorded"""
+        return len(self.moves)
+
+    def record(self, move):
+        """Play an encoded move on the board and record it at the current ply.
+
+        Any moves after the current ply (left over from seeking back) are
+        discarded, so recording after a take-back starts a new line.
+        """
+        if self.ply < len(self.moves):
+            self.truncate()
+
+        record = self.board.make_move(move)
+        if not record:
+            return False
+
+        self.moves.append(record.move)
+        self.records.append(record)
+        self.ply += 1
+
+        if self.ply % self.checkpoint_interval == 0:
+            self.checkpoints.append(self.board.snapshot())
+
+        return record
+
+    def truncate(self):
+        """Forget every move after the current ply"""
+        del self.moves[self.ply:]
+        del self.records[self.ply:]
+        del self.checkpoints[self.ply // self.checkpoint_interval + 1:]
+
+    def undo(self):
+        """Step back one ply, keeping the move for redo. Returns False at the start."""
+        if self.ply == 0:
+            return False
+        self.seek(self.ply - 1)
+        return True
+
+    def redo(self):
+        """Step forward one ply. Returns False at the end of the history."""
+        if self.ply == len(self.moves):
+            return False
+        self.seek(self.ply + 1)
+        return True
+
+    def seek(self, ply):
+        """Show the position after the given ply on the board"""
+        if not 0 <= ply <= len(self.moves):
+            raise IndexError(f"ply {ply} out of range 0-{len(self.moves)}")
+
+        checkpoint = ply // self.checkpoint_interval
+        checkpoint_ply = checkpoint * self.checkpoint_interval
+
+        # Walk from the current ply when that takes fewer steps than
+        # replaying from the checkpoint
+        steps_from_current = abs(ply - self.ply)
+        if ply < self.undo_from:
+            # Restoring a checkpoint creates new pieces, so older undo
+            # records no longer apply
+            steps_from_current = None
+
+        if steps_from_current is None or steps_from_current > ply - checkpoint_ply:
+            self.board.restore(self.checkpoints[checkpoint])
+            self.ply = checkpoint_ply
+            self.undo_from = checkpoint_ply
+
+        while self.ply > ply:
+            self.ply -= 1
+            self.board.undo_move(self.records[self.ply])
+
+        while self.ply < ply:
+            self.records[self.ply] = self.board.make_move(self.moves[self.ply])
+            self.ply += 1
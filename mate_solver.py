@@ -0,0 +1,245 @@
+"""Mate-in-N solver for puzzle and demo positions.
+
+Proves or refutes a forced mate with a checks-first AND/OR search:
+
+- the attacker tries checking moves first, then captures, then the rest, and
+  on its last move only checking moves are tried (a mate must give check)
+- the defender tries captures and king moves first, since those are the
+  most likely refutations, and one refutation is enough to prune the line
+- positions already refuted at a given depth are remembered and skipped
+
+Mates are searched for with increasing N, so the shortest mate is found.
+Lines are printed as UCI moves; see ChessBoard.parse_uci_move for promotions.
+
+    python mate_solver.py --demo
+    python mate_solver.py --fen "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1" --moves 1
+    python mate_solver.py --file puzzles.txt --moves 3 --processes 4
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import sys
+import time
+from multiprocessing import Pool
+
+from chess_board import ChessBoard
+from move_encoding import MoveList, move_to_uci, is_capture
+
+MAX_MATE_MOVES = 8
+
+class MateSolver:
+    """Searches a ChessBoard for forced mates by the side to move"""
+    def __init__(self, board, node_limit=None):
+        self.board = board
+        self.node_limit = node_limit
+        self.nodes = 0
+        # Positions (and remaining attacker moves) known not to be forced mates
+        self.refuted = set()
+        # One reusable move buffer per ply
+        self.move_lists = [MoveList() for _ in range(2 * MAX_MATE_MOVES + 1)]
+
+    def find_mate(self, max_moves):
+        """Return the shortest mating line of at most max_moves attacker moves.
+
+        The line is a list of encoded moves (attacker first, ending with the
+        mate), or None when there is no forced mate that short.
+        """
+        if max_moves > MAX_MATE_MOVES:
+            raise ValueError(f"mate searches are limited to {MAX_MATE_MOVES} moves")
+        self.attacker = self.board.turn
+        self.defender = "black" if self.attacker == "white" else "white"
+        for moves in range(1, max_moves + 1):
+            line = self.attack(moves, 0)
+            if line is not None:
+                return line
+        return None
+
+    def position_key(self, moves_left):
+        squares, _, castling, en_passant_target, turn, _ = self.board.snapshot()
+        return squares, castling, en_passant_target, turn, moves_left
+
+    def count_node(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise TimeoutError(f"mate search exceeded {self.node_limit} nodes")
+
+    def attack(self, moves_left, ply):
+        """Attacker to move: return a line forcing mate within moves_left, or None"""
+        self.count_node()
+        key = self.position_key(moves_left)
+        if key in self.refuted:
+            return None
+
+        board = self.board
+        move_list = self.move_lists[ply]
+        board.generate_all_valid_moves(self.attacker, move_list)
+
+        # Checks first, then captures, then quiet moves (skipped on the last move)
+        checks, captures, quiet = [], [], []
+        for move in move_list.to_list():
+            record = board.make_move(move)
+            gives_check = board.is_in_check(self.defender)
+            board.undo_move(record)
+            if gives_check:
+                checks.append(move)
+            elif moves_left > 1:
+                (captures if is_capture(move) else quiet).append(move)
+
+        for move in checks + captures + quiet:
+            record = board.make_move(move)
+            line = self.defend(moves_left, ply + 1)
+            board.undo_move(record)
+            if line is not None:
+                return [move] + line
+
+        self.refuted.add(key)
+        return None
+
+    def defend(self, moves_left, ply):
+        """Defender to move after the attacker's move: return the most stubborn
+        line if every defence loses within the remaining moves, else None"""
+        self.count_node()
+        board = self.board
+        move_list = self.move_lists[ply]
+        board.generate_all_valid_moves(self.defender, move_list)
+
+        if not move_list:
+            # Checkmate proves the line; stalemate refutes it
+            return [] if board.is_in_check(self.defender) else None
+        if moves_left == 1:
+            return None
+
+        # Captures and king moves are the likeliest refutations, so try them first
+        king_pos = board.white_king_pos if self.defender == "white" else board.black_king_pos
+        king_square = king_pos[0] * 8 + king_pos[1]
+        moves = move_list.to_list()
+        moves.sort(key=lambda move: (not is_capture(move), (move >> 6 & 63) != king_square))
+
+        best_line = None
+        for move in moves:
+            record = board.make_move(move)
+            line = self.attack(moves_left - 1, ply + 1)
+            board.undo_move(record)
+            if line is None:
+                return None
+            if best_line is None or len(line) + 1 > len(best_line):
+                best_line = [move] + line
+        return best_line
+
+def solve_fen(fen, max_moves, node_limit=None):
+    """Solve one FEN position; returns a result dict.
+
+    A malformed FEN or move count gives status "invalid" with the reason in
+    "error", so one bad puzzle does not stop a batch.
+    """
+    board = ChessBoard()
+    solver = MateSolver(board, node_limit)
+    start = time.perf_counter()
+    line = None
+    error = None
+    try:
+        if not str(max_moves).isdigit():
+            raise ValueError(f"invalid move count: {max_moves!r}")
+        board.load_fen(fen)
+        line = solver.find_mate(int(max_moves))
+        status = "mate" if line is not None else "no mate"
+    except TimeoutError:
+        status = "unknown"
+    except ValueError as exception:
+        status = "invalid"
+        error = str(exception)
+    result = {
+        "fen": fen,
+        "status": status,
+        "mate_in": (len(line) + 1) // 2 if line else None,
+        "line": [move_to_uci(move) for move in line] if line else [],
+        "nodes": solver.nodes,
+        "seconds": time.perf_counter() - start,
+    }
+    if error is not None:
+        result["error"] = error
+    return result
+
+def _solve_task(args):
+    """Pool entry point for solve_batch"""
+    return solve_fen(*args)
+
+def solve_batch(puzzles, max_moves, processes=None, node_limit=None):
+    """Solve many positions across a process pool.
+
+    puzzles is a list of FEN strings or (FEN, max moves) pairs. Results are
+    returned in input order.
+    """
+    tasks = []
+    for puzzle in puzzles:
+        if isinstance(puzzle, str):
+            tasks.append((puzzle, max_moves, node_limit))
+        else:
+            tasks.append((puzzle[0], puzzle[1], node_limit))
+    if processes == 1:
+        return [_solve_task(task) for task in tasks]
+    with Pool(processes) as pool:
+        return pool.map(_solve_task, tasks, chunksize=max(1, len(tasks) // (4 * (processes or os.cpu_count()))))
+
+def read_puzzles(path, default_moves):
+    """Read puzzles, one per line as 'FEN' or 'FEN; N'. Blank lines and # comments are skipped.
+
+    N is kept as written; solve_fen reports a puzzle with a bad N as invalid.
+    """
+    puzzles = []
+    with open(path) as puzzle_file:
+        for line in puzzle_file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fen, _, moves = line.partition(";")
+            puzzles.append((fen.strip(), moves.strip() or default_moves))
+    return puzzles
+
+def demo_fen():
+    """FEN of the demo.py position"""
+    from demo import setup_demo_board
+    board = ChessBoard()
+    setup_demo_board(board)
+    return board.to_fen()
+
+def format_result(result):
+    if result["status"] == "mate":
+        return f"mate in {result['mate_in']}: {' '.join(result['line'])}"
+    if result["status"] == "invalid":
+        return f"invalid: {result['error']}"
+    return result["status"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prove or refute forced mates.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fen", help="position to solve")
+    source.add_argument("--file", help="puzzle file, one 'FEN' or 'FEN; N' per line")
+    source.add_argument("--demo", action="store_true", help="solve the demo.py position")
+    parser.add_argument("--moves", type=int, default=2, help="mate in at most this many moves")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes for --file")
+    parser.add_argument("--node-limit", type=int, default=None, help="give up on a position after this many nodes")
+    args = parser.parse_args(argv)
+
+    if args.file:
+        puzzles = read_puzzles(args.file, args.moves)
+        start = time.perf_counter()
+        results = solve_batch(puzzles, args.moves, args.processes, args.node_limit)
+        elapsed = time.perf_counter() - start
+        failed = 0
+        for (fen, moves), result in zip(puzzles, results):
+            if result["status"] != "mate":
+                failed += 1
+            print(f"{fen}; {moves}: {format_result(result)}")
+        print(f"{len(results) - failed}/{len(results)} puzzles verified in {elapsed:.2f}s")
+        return 1 if failed else 0
+
+    fen = args.fen or demo_fen()
+    result = solve_fen(fen, args.moves, args.node_limit)
+    print(fen)
+    print(f"{format_result(result)} ({result['nodes']} nodes, {result['seconds']:.2f}s)")
+    return 0 if result["status"] == "mate" else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
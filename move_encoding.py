@@ -0,0 +1,100 @@
+from array import array
+
+# A move is packed into 16 bits:
+#   bits 0-5   destination square (row * 8 + col)
+#   bits 6-11  origin square
+#   bits 12-15 flags
+# 0 never encodes a real move (a1 to a1), so it doubles as "no move".
+NO_MOVE = 0
+
+FLAG_QUIET = 0
+FLAG_DOUBLE_PAWN_PUSH = 1
+FLAG_KINGSIDE_CASTLE = 2
+FLAG_QUEENSIDE_CASTLE = 3
+FLAG_CAPTURE = 4
+FLAG_EN_PASSANT = 5
+FLAG_PROMOTION = 8  # Always to a queen; combined with FLAG_CAPTURE for capturing promotions
+
+# More than the 218 moves of the richest known legal position
+MAX_MOVES = 256
+
+def encode_move(from_row, from_col, to_row, to_col, flag=FLAG_QUIET):
+    """Pack a move into a 16-bit integer"""
+    return flag << 12 | (from_row * 8 + from_col) << 6 | to_row * 8 + to_col
+
+def move_from(move):
+    """Return the (row, col) a move starts from"""
+    return divmod(move >> 6 & 63, 8)
+
+def move_to(move):
+    """Return the (row, col) a move goes to"""
+    return divmod(move & 63, 8)
+
+def move_flag(move):
+    """Return the flag bits of a move"""
+    return move >> 12
+
+def is_capture(move):
+    """True for captures, including en passant and capturing promotions"""
+    return bool(move >> 12 & FLAG_CAPTURE)
+
+def is_promotion(move):
+    """True for pawn promotions"""
+    return bool(move >> 12 & FLAG_PROMOTION)
+
+def move_to_uci(move):
+    """Format a move in UCI long algebraic notation, e.g. e2e4 or e7e8q"""
+    from_row, from_col = move_from(move)
+    to_row, to_col = move_to(move)
+    text = chr(97 + from_col) + str(8 - from_row) + chr(97 + to_col) + str(8 - to_row)
+    return text + "q" if is_promotion(move) else text
+
+class MoveList:
+    """Preallocated buffer of encoded moves that is reused across plies"""
+    def __init__(self, size=MAX_MOVES):
+        self.moves = array("H", bytes(2 * size))
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not -self.count <= index < self.count:
+            raise IndexError("move list index out of range")
+        return self.moves[index % self.count]
+
+    def __iter__(self):
+        moves = self.moves
+        for index in range(self.count):
+            yield moves[index]
+
+    def __contains__(self, move):
+        return self.index(move) >= 0
+
+    def append(self, move):
+        self.moves[self.count] = move
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    def index(self, move):
+        """Position of the move in the list, or -1"""
+        moves = self.moves
+        for index in range(self.count):
+            if moves[index] == move:
+                return index
+        return -1
+
+    def find(self, from_row, from_col, to_row, to_col):
+        """Return the move between the given squares, or NO_MOVE"""
+        squares = (from_row * 8 + from_col) << 6 | to_row * 8 + to_col
+        moves = self.moves
+        for index in range(self.count):
+            if moves[index] & 0xFFF == squares:
+                return moves[index]
+        return NO_MOVE
+
+    def to_list(self):
+        """Copy the moves into a plain list"""
+        return self.moves[:self.count].tolist()
@@ -0,0 +1,294 @@
+"""On-disk position index for "seen in games" lookups.
+
+Maps ChessBoard.position_hash values to postings (game id, ply, game result)
+for every position of every game in a corpus. The index file holds fixed-size
+records sorted by hash, grouped into blocks, followed by a fence array with
+the first hash of each block:
+
+    header | records (BLOCK_RECORDS per block) | fence hashes
+
+Lookups memory-map the file and binary search the fences and then one block,
+so a query costs O(log n) page reads and nothing is loaded into RAM up front.
+Building is an external sort: postings are sorted in memory-sized runs that
+are written to temporary files and then merged into the final file.
+
+The corpus is a text file with one game per line, "result move move ...",
+using UCI moves (the format written by self_play.py --output).
+
+    python position_index.py build games.txt positions.idx
+    python position_index.py query positions.idx --moves e2e4 e7e5
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import heapq
+import mmap
+import struct
+import sys
+import tempfile
+from multiprocessing import Pool
+
+from chess_board import ChessBoard
+from move_encoding import MoveList
+
+MAGIC = b"CHESSIDX"
+HEADER_FORMAT = "<8sQIIQ"  # magic, record count, records per block, block count, fence offset
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_FORMAT = "<QIHBx"  # position hash, game id, ply, result
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+FENCE_FORMAT = "<Q"
+FENCE_SIZE = struct.calcsize(FENCE_FORMAT)
+
+BLOCK_RECORDS = 256  # 4 KB blocks
+RUN_RECORDS = 2_000_000  # Postings sorted in memory before spilling a run to disk
+READ_CHUNK_RECORDS = 4096
+
+RESULT_WHITE_WINS = 0
+RESULT_DRAW = 1
+RESULT_BLACK_WINS = 2
+RESULT_UNKNOWN = 3
+RESULT_CODES = {"1-0": RESULT_WHITE_WINS, "1/2-1/2": RESULT_DRAW, "0-1": RESULT_BLACK_WINS}
+
+def game_postings(game_id, result, uci_moves, move_list=None):
+    """Replay a game and return its (hash, game id, ply, result) postings, from ply 0.
+    
+    Every move is checked with ChessBoard.parse_uci_move, so a malformed or
+    illegal move raises ValueError. move_list is a MoveList to reuse.
+    """
+    board = ChessBoard()
+    move_list = move_list if move_list is not None else MoveList()
+    result_code = RESULT_CODES.get(result, RESULT_UNKNOWN)
+    postings = [(board.position_hash(), game_id, 0, result_code)]
+    for ply, text in enumerate(uci_moves, 1):
+        try:
+            move = board.parse_uci_move(text, move_list)
+        except ValueError as error:
+            raise ValueError(f"{error} at ply {ply}")
+        board.make_move(move)
+        postings.append((board.position_hash(), game_id, ply, result_code))
+    return postings
+
+# Per-process state, set up by _init_worker
+WORKER = {}
+
+def _init_worker():
+    WORKER["moves"] = MoveList()
+
+def _postings_task(args):
+    """Pool entry point: postings for one corpus line, or an empty list for a bad game"""
+    game_id, line = args
+    fields = line.split()
+    try:
+        return game_postings(game_id, fields[0], fields[1:], WORKER["moves"])
+    except ValueError:
+        return []
+
+def _read_run(path):
+    """Yield the records of a sorted run file"""
+    with open(path, "rb") as run_file:
+        while True:
+            chunk = run_file.read(RECORD_SIZE * READ_CHUNK_RECORDS)
+            if not chunk:
+                return
+            yield from struct.iter_unpack(RECORD_FORMAT, chunk)
+
+class PositionIndexBuilder:
+    """Builds an index file with an external merge sort"""
+    def __init__(self, path, run_records=RUN_RECORDS, block_records=BLOCK_RECORDS, temp_dir=None):
+        self.path = path
+        self.run_records = run_records
+        self.block_records = block_records
+        self.temp_dir = tempfile.mkdtemp(prefix="position-index-", dir=temp_dir)
+        self.buffer = []
+        self.run_paths = []
+
+    def add(self, position_hash, game_id, ply, result_code):
+        self.buffer.append((position_hash, game_id, ply, result_code))
+        if len(self.buffer) >= self.run_records:
+            self.spill()
+
+    def add_postings(self, postings):
+        for posting in postings:
+            self.add(*posting)
+
+    def spill(self):
+        """Sort the buffered postings and write them out as a run"""
+        if not self.buffer:
+            return
+        self.buffer.sort()
+        path = os.path.join(self.temp_dir, f"run-{len(self.run_paths):05d}.bin")
+        pack = struct.Struct(RECORD_FORMAT).pack
+        with open(path, "wb") as run_file:
+            for start in range(0, len(self.buffer), READ_CHUNK_RECORDS):
+                run_file.write(b"".join(pack(*record) for record in self.buffer[start:start + READ_CHUNK_RECORDS]))
+        self.run_paths.append(path)
+        self.buffer = []
+
+    def finish(self):
+        """Merge the runs into the index file and remove the temporary files"""
+        self.spill()
+        pack = struct.Struct(RECORD_FORMAT).pack
+        fences = []
+        count = 0
+        try:
+            with open(self.path, "wb") as index_file:
+                index_file.write(b"\0" * HEADER_SIZE)
+                pending = []
+                for record in heapq.merge(*(_read_run(path) for path in self.run_paths)):
+                    if count % self.block_records == 0:
+                        fences.append(record[0])
+                    pending.append(pack(*record))
+                    count += 1
+                    if len(pending) >= READ_CHUNK_RECORDS:
+                        index_file.write(b"".join(pending))
+                        pending = []
+                index_file.write(b"".join(pending))
+
+                fence_offset = HEADER_SIZE + count * RECORD_SIZE
+                index_file.write(b"".join(struct.pack(FENCE_FORMAT, fence) for fence in fences))
+                index_file.seek(0)
+                index_file.write(struct.pack(HEADER_FORMAT, MAGIC, count, self.block_records,
+                                             len(fences), fence_offset))
+        finally:
+            for path in self.run_paths:
+                os.remove(path)
+            os.rmdir(self.temp_dir)
+        return count
+
+def build_index(corpus_path, index_path, processes=None, run_records=RUN_RECORDS, temp_dir=None):
+    """Index every position of every game in a corpus file. Returns (games, postings)."""
+    builder = PositionIndexBuilder(index_path, run_records, temp_dir=temp_dir)
+    games = 0
+    with open(corpus_path) as corpus_file:
+        tasks = ((game_id, line) for game_id, line in enumerate(corpus_file) if line.strip())
+        with Pool(processes, initializer=_init_worker) as pool:
+            for postings in pool.imap(_postings_task, tasks, chunksize=64):
+                if postings:
+                    games += 1
+                builder.add_postings(postings)
+    return games, builder.finish()
+
+class PositionIndex:
+    """Read-only, memory-mapped view of an index file"""
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.block_records, self.block_count, self.fence_offset = \
+            struct.unpack_from(HEADER_FORMAT, self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a position index")
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def fence(self, block):
+        return struct.unpack_from(FENCE_FORMAT, self.map, self.fence_offset + block * FENCE_SIZE)[0]
+
+    def record(self, index):
+        return struct.unpack_from(RECORD_FORMAT, self.map, HEADER_SIZE + index * RECORD_SIZE)
+
+    def first_record(self, position_hash):
+        """Index of the first record with a hash >= position_hash"""
+        # Last block starting before the hash; earlier blocks cannot hold it
+        low, high = 0, self.block_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.fence(middle) < position_hash:
+                low = middle + 1
+            else:
+                high = middle
+        block = max(0, low - 1)
+
+        low = block * self.block_records
+        high = min(self.count, (block + 1) * self.block_records)
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle)[0] < position_hash:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def postings(self, position_hash, limit=None):
+        """(game id, ply, result code) for each occurrence of the position"""
+        postings = []
+        index = self.first_record(position_hash)
+        while index < self.count and (limit is None or len(postings) < limit):
+            record_hash, game_id, ply, result_code = self.record(index)
+            if record_hash != position_hash:
+                break
+            postings.append((game_id, ply, result_code))
+            index += 1
+        return postings
+
+    def stats(self, position):
+        """Games reaching a position (a ChessBoard or hash) and their results"""
+        position_hash = position if isinstance(position, int) else position.position_hash()
+        stats = {"games": 0, "occurrences": 0, "white_wins": 0, "draws": 0, "black_wins": 0}
+        last_game = None
+        for game_id, _, result_code in self.postings(position_hash):
+            stats["occurrences"] += 1
+            # Postings are sorted by game id, so repeats within a game are adjacent
+            if game_id == last_game:
+                continue
+            last_game = game_id
+            stats["games"] += 1
+            if result_code == RESULT_WHITE_WINS:
+                stats["white_wins"] += 1
+            elif result_code == RESULT_DRAW:
+                stats["draws"] += 1
+            elif result_code == RESULT_BLACK_WINS:
+                stats["black_wins"] += 1
+        return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query an on-disk position index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="index a corpus of 'result move move ...' lines")
+    build.add_argument("corpus")
+    build.add_argument("index")
+    build.add_argument("--processes", type=int, default=None)
+    build.add_argument("--run-records", type=int, default=RUN_RECORDS, help="postings sorted in memory per run")
+    build.add_argument("--temp-dir", default=None, help="directory for sorted runs")
+
+    query = commands.add_parser("query", help="look up a position")
+    query.add_argument("index")
+    position = query.add_mutually_exclusive_group()
+    position.add_argument("--fen")
+    position.add_argument("--moves", nargs="*", default=[], help="UCI moves from the starting position")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        games, postings = build_index(args.corpus, args.index, args.processes, args.run_records, args.temp_dir)
+        print(f"Indexed {postings} positions from {games} games into {args.index}")
+        return 0
+
+    board = ChessBoard()
+    try:
+        if args.fen:
+            board.load_fen(args.fen)
+        else:
+            moves = MoveList()
+            for text in args.moves:
+                board.make_move(board.parse_uci_move(text, moves))
+    except ValueError as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 1
+    with PositionIndex(args.index) as index:
+        stats = index.stats(board)
+    print(board.to_fen())
+    print(f"Seen in {stats['games']} games ({stats['occurrences']} times): "
+          f"white won {stats['white_wins']}, drawn {stats['draws']}, black won {stats['black_wins']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Headless batch board-image renderer.
+
+Renders PNG images of positions without opening a window, using SDL's dummy
+video driver and the normal ChessBoard.draw / Piece.draw code. Every worker
+process scales the piece sprites once and reuses them for all its images.
+
+    python render_images.py --fens positions.txt --out images/
+    python render_images.py --games games.txt --plies last --out images/
+
+--fens reads one FEN per line. --games reads "result move move ..." lines
+(as written by self_play.py --output) and renders every ply, the last ply or
+the plies listed, e.g. --plies 0,10,20.
+"""
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import signal
+import sys
+import time
+import warnings
+from multiprocessing import Pool
+
+import pygame
+from chess_board import ChessBoard
+from chess_pieces import build_sprite_atlas
+from move_encoding import MoveList, move_from, move_to
+from config import BACKGROUND_COLOR, SQUARE_SIZE, BOARD_MARGIN, HIGHLIGHT_COLOR
+
+# Per-process drawing state, set up by init_worker
+WORKER = {}
+
+def init_worker(square_size, margin, highlight_last_move):
+    """Start pygame headlessly and prepare the board, canvas and sprites"""
+    # Without fontconfig pygame warns and falls back to its default font
+    warnings.filterwarnings("ignore", module="pygame.sysfont")
+    pygame.display.init()
+    pygame.font.init()
+    # SDL turns SIGINT/SIGTERM into quit events, which would stop the pool from shutting workers down
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    board = ChessBoard()
+    board.square_size = square_size
+    board.board_margin = margin
+    size = board.cols * square_size + 2 * margin
+    WORKER["board"] = board
+    WORKER["moves"] = MoveList()
+    WORKER["surface"] = pygame.Surface((size, size))
+    WORKER["highlight_last_move"] = highlight_last_move
+    build_sprite_atlas(square_size)
+
+def render(path, last_move=None):
+    """Draw the worker's board and save it to path"""
+    board = WORKER["board"]
+    surface = WORKER["surface"]
+    surface.fill(BACKGROUND_COLOR)
+    board.draw(surface)
+    if last_move and WORKER["highlight_last_move"]:
+        for row, col in last_move:
+            board.highlight_square(surface, row, col, HIGHLIGHT_COLOR)
+    pygame.image.save(surface, path)
+
+def render_fen_task(args):
+    """Render one FEN position; returns the number of images written"""
+    fen, path = args
+    try:
+        WORKER["board"].load_fen(fen)
+    except ValueError as error:
+        print(f"skipping {fen!r}: {error}", file=sys.stderr)
+        return 0
+    render(path)
+    return 1
+
+def render_game_task(args):
+    """Replay one game and render the selected plies; returns the number of images written"""
+    game_id, line, plies, out_dir = args
+    board = WORKER["board"]
+    moves = WORKER["moves"]
+    start = ChessBoard().snapshot()
+    texts = line.split()[1:]
+
+    # Check the whole game first, so an illegal move skips it without writing any images
+    board.restore(start)
+    encoded = []
+    try:
+        for ply, text in enumerate(texts, 1):
+            try:
+                move = board.parse_uci_move(text, moves)
+            except ValueError as error:
+                raise ValueError(f"{error} at ply {ply}")
+            encoded.append(move)
+            board.make_move(move)
+    except ValueError as error:
+        print(f"skipping game {game_id}: {error}", file=sys.stderr)
+        return 0
+
+    wanted = set(range(len(encoded) + 1)) if plies == "all" else \
+        {len(encoded)} if plies == "last" else set(plies)
+    board.restore(start)
+    written = 0
+    last_move = None
+    for ply in range(len(encoded) + 1):
+        if ply:
+            move = encoded[ply - 1]
+            board.make_move(move)
+            last_move = (move_from(move), move_to(move))
+        if ply in wanted:
+            render(os.path.join(out_dir, f"game{game_id:06d}_ply{ply:03d}.png"), last_move)
+            written += 1
+    return written
+
+def parse_plies(text):
+    if text in ("all", "last"):
+        return text
+    return [int(ply) for ply in text.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render PNG board images without opening a window.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fens", help="file with one FEN per line")
+    source.add_argument("--games", help="file with one 'result move move ...' game per line")
+    parser.add_argument("--plies", type=parse_plies, default="last",
+                        help="for --games: all, last, or a comma separated list of plies")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--square-size", type=int, default=SQUARE_SIZE)
+    parser.add_argument("--margin", type=int, default=BOARD_MARGIN)
+    parser.add_argument("--no-highlight", action="store_true", help="do not highlight the last move")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    if args.fens:
+        with open(args.fens) as fen_file:
+            fens = [line.strip() for line in fen_file if line.strip()]
+        tasks = [(fen, os.path.join(args.out, f"{index:06d}.png")) for index, fen in enumerate(fens)]
+        task_function = render_fen_task
+    else:
+        with open(args.games) as games_file:
+            tasks = [(game_id, line, args.plies, args.out)
+                     for game_id, line in enumerate(games_file) if line.strip()]
+        task_function = render_game_task
+
+    start = time.perf_counter()
+    initargs = (args.square_size, args.margin, not args.no_highlight)
+    with Pool(args.processes, initializer=init_worker, initargs=initargs) as pool:
+        written = sum(pool.imap_unordered(task_function, tasks, chunksize=16))
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"Wrote {written} images to {args.out} in {elapsed:.2f}s ({written / elapsed * 60:.0f} images/minute)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
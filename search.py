@@ -0,0 +1,176 @@
+"""Alpha-beta search over ChessBoard.
+
+Iterative deepening negamax with a capture-only quiescence search, ordering
+the previous iteration's best line first and then captures by most valuable
+victim. The search can be stopped from another thread at any time, and its
+deadline can be set or moved while it runs (used for pondering).
+"""
+import time
+
+from evaluation import PIECE_VALUES
+from move_encoding import MoveList, move_to, is_capture, is_promotion, move_flag, FLAG_EN_PASSANT
+
+MATE_SCORE = 100000
+MAX_DEPTH = 64
+INFINITY = MATE_SCORE + 1
+
+# How many nodes pass between checks of the clock and the stop flag
+CHECK_INTERVAL = 512
+
+class SearchStopped(Exception):
+    """Raised inside the search when it has to return immediately"""
+
+class Search:
+    """Searches a ChessBoard for the best move of the side to move"""
+    def __init__(self, board):
+        self.board = board
+        self.stopped = False
+        self.deadline = None  # time.monotonic() value, or None to search until stopped
+        self.node_limit = None
+        self.nodes = 0
+        self.principal_variation = []
+        self.move_lists = [MoveList() for _ in range(2 * MAX_DEPTH + 32)]
+
+    def stop(self):
+        """Ask a running search to return as soon as possible"""
+        self.stopped = True
+
+    def check_limits(self):
+        if self.stopped:
+            raise SearchStopped()
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise SearchStopped()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchStopped()
+
+    def run(self, max_depth=MAX_DEPTH, info_callback=None):
+        """Search with iterative deepening until a limit is hit.
+
+        Returns the best line found (a list of encoded moves), which is empty
+        when the side to move has no moves. info_callback, if given, is called
+        after every completed depth with (depth, score, nodes, seconds, line).
+        """
+        start = time.monotonic()
+        self.nodes = 0
+        best_line = []
+
+        for depth in range(1, max_depth + 1):
+            try:
+                score, line = self.search_root(depth)
+            except SearchStopped:
+                break
+            best_line = line
+            self.principal_variation = line
+            if info_callback:
+                info_callback(depth, score, self.nodes, time.monotonic() - start, line)
+            if not line or abs(score) >= MATE_SCORE - MAX_DEPTH:
+                # No moves, or a forced mate was found; deeper search cannot change that
+                break
+
+        if not best_line:
+            # Stopped before depth 1 finished: fall back to any valid move
+            moves = self.move_lists[0]
+            self.board.generate_all_valid_moves(self.board.turn, moves)
+            best_line = [moves[0]] if moves else []
+        return best_line
+
+    def ordered_moves(self, ply, pv_move=None):
+        """Valid moves at this ply: the PV move, then captures by victim value, then the rest"""
+        board = self.board
+        moves = self.move_lists[ply]
+        board.generate_all_valid_moves(board.turn, moves)
+
+        def order(move):
+            if move == pv_move:
+                return -INFINITY
+            if is_promotion(move):
+                return -PIECE_VALUES["queen"]
+            if is_capture(move):
+                if move_flag(move) == FLAG_EN_PASSANT:
+                    return -PIECE_VALUES["pawn"]
+                to_row, to_col = move_to(move)
+                return -PIECE_VALUES[board.board[to_row][to_col].piece_type]
+            return 0
+
+        return sorted(moves.to_list(), key=order)
+
+    def search_root(self, depth):
+        alpha, beta = -INFINITY, INFINITY
+        pv_move = self.principal_variation[0] if self.principal_variation else None
+        best_line = []
+        for move in self.ordered_moves(0, pv_move):
+            record = self.board.make_move(move)
+            try:
+                score, line = self.negamax(depth - 1, 1, -beta, -alpha)
+            finally:
+                self.board.undo_move(record)
+            score = -score
+            if score > alpha or not best_line:
+                alpha = score
+                best_line = [move] + line
+        if not best_line:
+            return self.terminal_score(0), []
+        return alpha, best_line
+
+    def terminal_score(self, ply):
+        """Score of a position without moves: mated (sooner is worse) or stalemate"""
+        return -MATE_SCORE + ply if self.board.is_in_check(self.board.turn) else 0
+
+    def negamax(self, depth, ply, alpha, beta):
+        """Return (score, line) for the side to move"""
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+        if depth <= 0:
+            return self.quiescence(ply, alpha, beta), []
+
+        pv = self.principal_variation
+        pv_move = pv[ply] if ply < len(pv) else None
+        moves = self.ordered_moves(ply, pv_move)
+        if not moves:
+            return self.terminal_score(ply), []
+
+        best_line = []
+        for move in moves:
+            record = self.board.make_move(move)
+            try:
+                score, line = self.negamax(depth - 1, ply + 1, -beta, -alpha)
+            finally:
+                self.board.undo_move(record)
+            score = -score
+            if score >= beta:
+                return beta, []
+            if score > alpha:
+                alpha = score
+                best_line = [move] + line
+        return alpha, best_line
+
+    def quiescence(self, ply, alpha, beta):
+        """Search captures until the position is quiet"""
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        in_check = self.board.is_in_check(self.board.turn)
+        if not in_check:
+            stand_pat = self.board.evaluate()
+            if stand_pat >= beta:
+                return beta
+            alpha = max(alpha, stand_pat)
+
+        moves = self.ordered_moves(ply)
+        if not moves:
+            return self.terminal_score(ply) if in_check else alpha
+        for move in moves:
+            # Out of check every evasion is searched, otherwise only captures and promotions
+            if not in_check and not (is_capture(move) or is_promotion(move)):
+                continue
+            record = self.board.make_move(move)
+            try:
+                score = -self.quiescence(ply + 1, -beta, -alpha)
+            finally:
+                self.board.undo_move(record)
+            if score >= beta:
+                return beta
+            alpha = max(alpha, score)
+        return alpha
@@ -0,0 +1,301 @@
+"""Headless self-play simulator.
+
+Plays complete games across a process pool using ChessBoard.generate_all_valid_moves
+and make_move, and reports throughput and the distribution of outcomes.
+With --check every ply is also verified for board state consistency (king
+positions, piece coordinates, en passant and castling state, attack maps,
+evaluation totals, undo round trip).
+
+    python self_play.py --games 200 --processes 4 --check
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from chess_board import ChessBoard, square_name
+from move_encoding import MoveList, move_to_uci
+from time_clock import TimeClock
+
+MAX_PLIES = 400
+FIFTY_MOVE_PLIES = 100
+
+class RandomPolicy:
+    """Pick a uniformly random valid move"""
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, board, moves, ply):
+        return moves[self.rng.randrange(len(moves))]
+
+class ScriptedPolicy:
+    """Play a fixed list of moves, then fall back to random moves"""
+    def __init__(self, rng, script):
+        self.rng = rng
+        self.script = script
+
+    def choose(self, board, moves, ply):
+        if ply < len(self.script):
+            text = self.script[ply]
+            try:
+                return board.parse_uci_move(text, moves)
+            except ValueError as error:
+                raise ValueError(f"scripted move {text} is not valid at ply {ply + 1}: {error}")
+        return moves[self.rng.randrange(len(moves))]
+
+def repetition_key(board):
+    """Position key for threefold repetition (pieces, castling, en passant, side to move)"""
+    squares, _, castling, _, turn, _ = board.snapshot()
+    return squares, castling, board.capturable_en_passant_target(), turn
+
+def has_insufficient_material(board):
+    """True when neither side can possibly checkmate (K v K, K+minor v K)"""
+    minors = 0
+    for row in board.board:
+        for piece in row:
+            if piece is None or piece.piece_type == "king":
+                continue
+            if piece.piece_type in ("knight", "bishop"):
+                minors += 1
+            else:
+                return False
+    return minors <= 1
+
+def check_board_state(board):
+    """Return a list of inconsistencies in the board's tracked state"""
+    errors = []
+    kings = {}
+    for row in range(board.rows):
+        for col in range(board.cols):
+            piece = board.board[row][col]
+            if piece is None:
+                continue
+            if (piece.row, piece.col) != (row, col):
+                errors.append(f"{piece.color} {piece.piece_type} on {square_name(row, col)} "
+                              f"thinks it is on {square_name(piece.row, piece.col)}")
+            if piece.piece_type == "king":
+                kings.setdefault(piece.color, []).append((row, col))
+
+    for color, tracked in (("white", board.white_king_pos), ("black", board.black_king_pos)):
+        if kings.get(color) != [tracked]:
+            errors.append(f"{color} king tracked on {square_name(*tracked)} but found on "
+                          f"{[square_name(*pos) for pos in kings.get(color, [])]}")
+
+    if board.en_passant_target:
+        pawn = board.get_piece(*board.en_passant_target)
+        expected_row = 4 if board.turn == "black" else 3
+        if (not pawn or pawn.piece_type != "pawn" or pawn.color == board.turn
+                or board.en_passant_target[0] != expected_row):
+            errors.append(f"stale en passant target {square_name(*board.en_passant_target)}")
+
+    for color, home_row in (("white", 7), ("black", 0)):
+        rights = board.castling_rights[color]
+        if not (rights["kingside"] or rights["queenside"]):
+            continue
+        king = board.get_piece(home_row, 4)
+        if not king or king.piece_type != "king" or king.color != color or king.has_moved:
+            errors.append(f"{color} keeps castling rights without its king on the home square")
+
+    # Rebuild the attack maps from scratch, then put the incrementally kept ones back
+    kept_maps, kept_piece_attacks = board.attack_maps, board.piece_attacks
+    board.rebuild_attack_maps()
+    rebuilt_maps = board.attack_maps
+    board.attack_maps, board.piece_attacks = kept_maps, kept_piece_attacks
+    for color in ("white", "black"):
+        wrong = [square_name(row, col) for row in range(board.rows) for col in range(board.cols)
+                 if kept_maps[color][row][col] != rebuilt_maps[color][row][col]]
+        if wrong:
+            errors.append(f"{color} attack map differs from a rebuild on {', '.join(wrong)}")
+
+    kept = (board.material, board.piece_square_score, board.pawn_files, board.pawn_structure)
+    if kept != board.compute_evaluation():
+        errors.append(f"incremental evaluation {kept} differs from recomputed {board.compute_evaluation()}")
+
+    return errors
+
+def play_game(game_id, seed=0, policy="random", script=None, clock_seconds=None,
+              move_seconds=1.0, max_plies=MAX_PLIES, check=False, keep_moves=False):
+    """Play one complete game and return a summary dict.
+    
+    With the scripted policy, script is a list of games (lists of moves like
+    e2e4) and game N plays script[N % len(script)].
+    """
+    rng = random.Random(f"{seed}:{game_id}")
+    if policy == "scripted":
+        chooser = ScriptedPolicy(rng, script[game_id % len(script)] if script else [])
+    else:
+        chooser = RandomPolicy(rng)
+
+    board = ChessBoard()
+    clocks = None
+    if clock_seconds is not None:
+        clocks = {"white": TimeClock(clock_seconds), "black": TimeClock(clock_seconds)}
+
+    valid_moves = MoveList()
+    moves = []
+    errors = []
+    repetitions = Counter([repetition_key(board)])
+    quiet_plies = 0
+    result, reason = "1/2-1/2", "max plies"
+
+    for ply in range(max_plies):
+        color = board.turn
+        board.generate_all_valid_moves(color, valid_moves)
+
+        if not valid_moves:
+            if board.is_in_check(color):
+                result, reason = ("0-1" if color == "white" else "1-0"), "checkmate"
+            else:
+                result, reason = "1/2-1/2", "stalemate"
+            break
+
+        try:
+            move = chooser.choose(board, valid_moves, ply)
+        except ValueError as error:
+            errors.append(str(error))
+            result, reason = "*", "script error"
+            break
+
+        # Simulated thinking time comes off the mover's clock
+        if clocks:
+            clocks[color].time_left -= rng.uniform(0, 2 * move_seconds)
+            if clocks[color].time_left <= 0:
+                clocks[color].time_left = 0
+                result, reason = ("0-1" if color == "white" else "1-0"), "time"
+                break
+
+        before = board.snapshot() if check else None
+        record = board.make_move(move)
+        moves.append(move_to_uci(move))
+
+        if check:
+            after = board.snapshot()
+            board.undo_move(record)
+            if board.snapshot() != before:
+                errors.append(f"undo of {moves[-1]} at ply {ply + 1} did not restore the position")
+                board.restore(before)
+            record = board.make_move(move)
+            if board.snapshot() != after:
+                errors.append(f"replaying {moves[-1]} at ply {ply + 1} gave a different position")
+            errors.extend(f"ply {ply + 1} ({moves[-1]}): {error}" for error in check_board_state(board))
+            if errors:
+                result, reason = "*", "state error"
+                break
+
+        # Draw rules
+        if record.piece.piece_type == "pawn" or record.captured_piece:
+            quiet_plies = 0
+        else:
+            quiet_plies += 1
+        key = repetition_key(board)
+        repetitions[key] += 1
+
+        if quiet_plies >= FIFTY_MOVE_PLIES:
+            result, reason = "1/2-1/2", "fifty-move rule"
+            break
+        if repetitions[key] >= 3:
+            result, reason = "1/2-1/2", "threefold repetition"
+            break
+        if record.captured_piece and has_insufficient_material(board):
+            result, reason = "1/2-1/2", "insufficient material"
+            break
+
+    return {
+        "game_id": game_id,
+        "result": result,
+        "reason": reason,
+        "plies": len(moves),
+        "errors": errors,
+        "moves": moves if keep_moves or errors else None,
+    }
+
+def _play_game_task(args):
+    """Pool entry point: unpack the keyword arguments for play_game"""
+    game_id, options = args
+    return play_game(game_id, **options)
+
+def run(games, processes=None, **options):
+    """Play games in a process pool and return (summaries, elapsed seconds)"""
+    tasks = [(game_id, options) for game_id in range(games)]
+    start = time.perf_counter()
+    if processes == 1:
+        summaries = [_play_game_task(task) for task in tasks]
+    else:
+        with Pool(processes) as pool:
+            summaries = list(pool.imap_unordered(_play_game_task, tasks, chunksize=max(1, games // 64)))
+    elapsed = time.perf_counter() - start
+    summaries.sort(key=lambda summary: summary["game_id"])
+    return summaries, elapsed
+
+def build_report(summaries, elapsed):
+    """Summarize throughput and outcomes"""
+    plies = sum(summary["plies"] for summary in summaries)
+    return {
+        "games": len(summaries),
+        "plies": plies,
+        "seconds": round(elapsed, 3),
+        "games_per_second": round(len(summaries) / elapsed, 3) if elapsed else None,
+        "plies_per_second": round(plies / elapsed, 1) if elapsed else None,
+        "results": dict(Counter(summary["result"] for summary in summaries)),
+        "reasons": dict(Counter(summary["reason"] for summary in summaries)),
+        "games_with_errors": [
+            {"game_id": summary["game_id"], "errors": summary["errors"][:5], "moves": summary["moves"]}
+            for summary in summaries if summary["errors"]
+        ],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless self-play games and report throughput.")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--policy", choices=["random", "scripted"], default="random")
+    parser.add_argument("--script", help="file with one game per line of UCI moves like e2e4 (scripted policy)")
+    parser.add_argument("--clock", type=float, default=None, help="seconds per side; enables time losses")
+    parser.add_argument("--move-time", type=float, default=1.0, help="average simulated seconds per move")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    parser.add_argument("--check", action="store_true", help="verify board state after every ply")
+    parser.add_argument("--output", help="write each game as 'result move move ...' to this file")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    script = None
+    if args.policy == "scripted":
+        if not args.script:
+            parser.error("--policy scripted needs --script")
+        with open(args.script) as script_file:
+            script = [line.split() for line in script_file if line.strip()]
+
+    summaries, elapsed = run(args.games, args.processes, seed=args.seed, policy=args.policy, script=script,
+                             clock_seconds=args.clock, move_seconds=args.move_time, max_plies=args.max_plies,
+                             check=args.check, keep_moves=bool(args.output))
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            for summary in summaries:
+                output_file.write(" ".join([summary["result"]] + summary["moves"]) + "\n")
+
+    report = build_report(summaries, elapsed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Games:         {report['games']}")
+        print(f"Plies:         {report['plies']}")
+        print(f"Time:          {report['seconds']:.2f}s")
+        print(f"Games/second:  {report['games_per_second']}")
+        print(f"Plies/second:  {report['plies_per_second']}")
+        print("Results:       " + ", ".join(f"{key}: {value}" for key, value in sorted(report["results"].items())))
+        print("Reasons:       " + ", ".join(f"{key}: {value}" for key, value in sorted(report["reasons"].items())))
+        for game in report["games_with_errors"]:
+            print(f"Game {game['game_id']} state errors: {game['errors']}")
+
+    return 1 if report["games_with_errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
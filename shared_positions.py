@@ -0,0 +1,221 @@
+"""Batches of positions in shared memory for multi-core jobs.
+
+Pickling ChessBoard objects (nested lists of Piece instances) for every task
+costs more than many short tasks themselves. A PositionBatch instead keeps
+fixed-size position records and one result per position in a
+multiprocessing.shared_memory block:
+
+    header | PositionRecord * count | result * count
+
+Workers attach to the block by name once, load positions straight from the
+shared records and write their results into the shared result array, so the
+only thing sent per task is an index range.
+
+    with PositionBatch.create(len(boards)) as batch:
+        for index, board in enumerate(boards):
+            batch.store(index, board)
+        map_positions(count_legal_moves, batch)
+        counts = list(batch.results)
+        batch.unlink()
+
+    python shared_positions.py positions.txt --compare-pickle
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import ctypes
+import sys
+import time
+from multiprocessing import Pool, shared_memory
+
+from chess_board import ChessBoard, pack_castling, unpack_castling, pack_en_passant, unpack_en_passant
+from move_encoding import MoveList
+
+TURN_WHITE = 0
+TURN_BLACK = 1
+
+class BatchHeader(ctypes.Structure):
+    _fields_ = [
+        ("count", ctypes.c_uint32),
+        ("result_size", ctypes.c_uint32),
+    ]
+
+class PositionRecord(ctypes.Structure):
+    """One position: the snapshot() squares string plus the state needed for play"""
+    _fields_ = [
+        ("squares", ctypes.c_char * 64),
+        ("turn", ctypes.c_uint8),
+        ("castling", ctypes.c_uint8),  # pack_castling bits
+        ("en_passant", ctypes.c_uint8),  # pack_en_passant square of the pawn that can be taken
+    ]
+
+def _aligned(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+class PositionBatch:
+    """Position records and per-position results in one shared memory block"""
+    def __init__(self, memory, count, result_type):
+        self.memory = memory
+        self.count = count
+        self.result_type = result_type
+        self.header = BatchHeader.from_buffer(memory.buf)
+        positions_offset = _aligned(ctypes.sizeof(BatchHeader))
+        results_offset = _aligned(positions_offset + count * ctypes.sizeof(PositionRecord))
+        self.positions = (PositionRecord * count).from_buffer(memory.buf, positions_offset)
+        self.results = (result_type * count).from_buffer(memory.buf, results_offset)
+
+    @staticmethod
+    def size(count, result_type=ctypes.c_int32):
+        """Bytes needed for a batch of count positions"""
+        positions_offset = _aligned(ctypes.sizeof(BatchHeader))
+        results_offset = _aligned(positions_offset + count * ctypes.sizeof(PositionRecord))
+        return results_offset + count * ctypes.sizeof(result_type)
+
+    @classmethod
+    def create(cls, count, result_type=ctypes.c_int32, name=None):
+        """Allocate a new, zeroed batch; the creator is responsible for unlink()"""
+        memory = shared_memory.SharedMemory(name=name, create=True, size=cls.size(count, result_type))
+        batch = cls(memory, count, result_type)
+        batch.header.count = count
+        batch.header.result_size = ctypes.sizeof(result_type)
+        return batch
+
+    @classmethod
+    def attach(cls, name, result_type=ctypes.c_int32):
+        """Attach to a batch created by another process"""
+        memory = shared_memory.SharedMemory(name=name)
+        header = BatchHeader.from_buffer(memory.buf)
+        count, result_size = header.count, header.result_size
+        del header
+        if result_size != ctypes.sizeof(result_type):
+            memory.close()
+            raise ValueError(f"batch results are {result_size} bytes, not {ctypes.sizeof(result_type)}")
+        return cls(memory, count, result_type)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def __len__(self):
+        return self.count
+
+    def store(self, index, board):
+        """Write a board's position into record index"""
+        squares, _, castling, en_passant_target, turn, _ = board.snapshot()
+        record = self.positions[index]
+        record.squares = squares.encode("ascii")
+        record.turn = TURN_WHITE if turn == "white" else TURN_BLACK
+        record.castling = pack_castling(castling)
+        record.en_passant = pack_en_passant(en_passant_target)
+
+    def load(self, index, board):
+        """Set up board with the position in record index"""
+        record = self.positions[index]
+        turn = "white" if record.turn == TURN_WHITE else "black"
+        board.load_position(record.squares.decode("ascii"), unpack_castling(record.castling),
+                            unpack_en_passant(record.en_passant), turn)
+
+    def close(self):
+        """Detach from the shared memory; the ctypes views must go first"""
+        self.header = self.positions = self.results = None
+        self.memory.close()
+
+    def unlink(self):
+        """Free the shared memory once every process has closed it"""
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Per-process state, set up by _init_worker
+WORKER = {}
+
+def _init_worker(name, result_type, function):
+    WORKER["batch"] = PositionBatch.attach(name, result_type)
+    WORKER["board"] = ChessBoard()
+    WORKER["moves"] = MoveList()
+    WORKER["function"] = function
+
+def _init_pickled_worker():
+    WORKER["moves"] = MoveList()
+
+def _map_task(bounds):
+    """Apply the worker's function to the positions in [start, stop)"""
+    start, stop = bounds
+    batch, board, function = WORKER["batch"], WORKER["board"], WORKER["function"]
+    for index in range(start, stop):
+        batch.load(index, board)
+        batch.results[index] = function(board)
+    return stop - start
+
+def map_positions(function, batch, processes=None, chunk_size=None):
+    """Store function(board) in batch.results for every position, across a process pool.
+
+    function must be a module-level function (it is pickled once per worker)
+    returning a value that fits the batch's result type. Returns the number
+    of positions processed.
+    """
+    processes = processes or os.cpu_count()
+    chunk_size = chunk_size or max(1, len(batch) // (4 * processes))
+    ranges = [(start, min(start + chunk_size, len(batch))) for start in range(0, len(batch), chunk_size)]
+    with Pool(processes, initializer=_init_worker, initargs=(batch.name, batch.result_type, function)) as pool:
+        done = sum(pool.imap_unordered(_map_task, ranges))
+        pool.close()
+        pool.join()
+    return done
+
+def count_legal_moves(board):
+    """Number of valid moves for the side to move"""
+    moves = WORKER["moves"]
+    board.generate_all_valid_moves(board.turn, moves)
+    return len(moves)
+
+def _pickled_task(board):
+    """Baseline for --compare-pickle: the board itself is sent to the worker"""
+    return count_legal_moves(board)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count legal moves for a file of FEN positions using shared memory.")
+    parser.add_argument("fens", help="file with one FEN per line")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--compare-pickle", action="store_true", help="also time sending pickled ChessBoards")
+    args = parser.parse_args(argv)
+
+    boards = []
+    with open(args.fens) as fen_file:
+        for line in fen_file:
+            if line.strip():
+                board = ChessBoard()
+                board.load_fen(line)
+                boards.append(board)
+
+    start = time.perf_counter()
+    batch = PositionBatch.create(len(boards))
+    try:
+        for index, board in enumerate(boards):
+            batch.store(index, board)
+        map_positions(count_legal_moves, batch, args.processes)
+        counts = list(batch.results)
+    finally:
+        batch.close()
+        batch.unlink()
+    elapsed = time.perf_counter() - start
+    print(f"Shared memory: {len(counts)} positions, {sum(counts)} legal moves in {elapsed:.2f}s")
+
+    if args.compare_pickle:
+        start = time.perf_counter()
+        with Pool(args.processes, initializer=_init_pickled_worker) as pool:
+            pickled_counts = pool.map(_pickled_task, boards, chunksize=max(1, len(boards) // (4 * (args.processes or os.cpu_count()))))
+        elapsed = time.perf_counter() - start
+        print(f"Pickled boards: {len(pickled_counts)} positions, {sum(pickled_counts)} legal moves in {elapsed:.2f}s")
+        if pickled_counts != counts:
+            print("Results differ between shared memory and pickled boards")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import pygame
 import time
+from chess_pieces import get_font
 
 class TimeClock:
     def __init__(self, initial_time_seconds):
@@ -53,7 +54,7 @@ class TimeClock:
         pygame.draw.rect(screen, (50, 50, 50), (x, y, 120, 40), 2, border_radius=5)
         
         # Draw time text
-        font = pygame.font.SysFont("Arial", 24, bold=True)
+        font = get_font("Arial", 24, bold=True)
         time_text = self.format_time()
         color = (0, 0, 0) if self.time_left > 30 else (255, 0, 0)  # Red when time is low
         text = font.render(time_text, True, color)
@@ -0,0 +1,230 @@
+"""UCI protocol front end.
+
+Lets tournament managers and GUIs (cutechess-cli, Arena, ...) play the rules
+engine and search over the Universal Chess Interface:
+
+    cutechess-cli -engine cmd="python uci.py" -engine cmd=other-engine ...
+
+Commands are read on a separate thread into a queue, and every search runs on
+its own thread, so stop, ponderhit and isready are answered while searching.
+With "go ponder" the engine thinks on the opponent's time without a deadline
+until the GUI sends ponderhit (the clock starts) or stop (the search ends).
+Moves are read with ChessBoard.parse_uci_move, which also covers promotions.
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import queue
+import sys
+import threading
+import time
+
+from chess_board import ChessBoard
+from move_encoding import MoveList, move_to_uci
+from search import Search, MATE_SCORE, MAX_DEPTH
+
+ENGINE_NAME = "Cursor Chess"
+ENGINE_AUTHOR = "Cursor Chess contributors"
+
+# Time management
+DEFAULT_MOVES_TO_GO = 30
+MOVE_OVERHEAD_MS = 50  # Kept back for process and pipe latency
+MIN_SEARCH_MS = 10
+
+GO_NUMBERS = {"wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth", "nodes"}
+
+def read_commands(stream, commands):
+    """Reader thread: put every input line on the queue, then quit at end of input"""
+    for line in stream:
+        commands.put(line)
+    commands.put("quit")
+
+def parse_go(tokens):
+    """Parse the arguments of a go command into a dict.
+    
+    Returns (params, errors). An argument with a value that is not a number
+    is left out of params and described in errors, so the search still runs.
+    """
+    params = {}
+    errors = []
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token in GO_NUMBERS and index + 1 < len(tokens):
+            try:
+                params[token] = int(tokens[index + 1])
+            except ValueError:
+                errors.append(f"ignoring {token}: {tokens[index + 1]!r} is not a number")
+            index += 2
+            continue
+        if token in ("ponder", "infinite"):
+            params[token] = True
+        index += 1
+    return params, errors
+
+def time_budget(params, color):
+    """Seconds to spend on this move, or None to search until stopped"""
+    if "movetime" in params:
+        return max(MIN_SEARCH_MS, params["movetime"] - MOVE_OVERHEAD_MS) / 1000
+    time_left = params.get("wtime" if color == "white" else "btime")
+    if time_left is None:
+        return None
+    increment = params.get("winc" if color == "white" else "binc", 0)
+    moves_to_go = params.get("movestogo", DEFAULT_MOVES_TO_GO)
+    budget = time_left / max(1, moves_to_go) + increment * 3 // 4
+    budget = min(budget, time_left // 2 - MOVE_OVERHEAD_MS)
+    return max(MIN_SEARCH_MS, budget) / 1000
+
+def format_score(score):
+    """UCI score field: centipawns, or moves to mate for mate scores"""
+    if abs(score) >= MATE_SCORE - MAX_DEPTH:
+        plies = MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+class UciEngine:
+    """Handles UCI commands for one engine process"""
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.board = ChessBoard()
+        self.move_list = MoveList()
+        self.search = None
+        self.search_thread = None
+        self.go_params = {}
+        # Set when the best move may be sent; held back while pondering or in infinite mode
+        self.release = threading.Event()
+
+    def send(self, text):
+        with self.output_lock:
+            self.output.write(text + "\n")
+            self.output.flush()
+
+    def handle(self, line):
+        """Handle one command line; returns False on quit"""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send("option name Ponder type check default true")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop_search()
+            self.board = ChessBoard()
+        elif command == "position":
+            self.stop_search()
+            self.set_position(arguments)
+        elif command == "go":
+            self.stop_search()
+            params, errors = parse_go(arguments)
+            for error in errors:
+                self.send(f"info string {error}")
+            self.start_search(params)
+        elif command == "stop":
+            self.stop_search()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            self.stop_search()
+            return False
+        # setoption, debug, register and unknown commands are ignored
+        return True
+
+    def set_position(self, arguments):
+        """position startpos|fen <fen> [moves <move> ...]"""
+        if "moves" in arguments:
+            split = arguments.index("moves")
+            setup, moves = arguments[:split], arguments[split + 1:]
+        else:
+            setup, moves = arguments, []
+
+        board = ChessBoard()
+        if setup and setup[0] == "fen":
+            try:
+                board.load_fen(" ".join(setup[1:]))
+            except ValueError as error:
+                self.send(f"info string {error}")
+                return
+        elif setup != ["startpos"]:
+            self.send(f"info string unknown position {' '.join(setup)!r}")
+            return
+
+        # A bad move rejects the whole command and keeps the previous position
+        for text in moves:
+            try:
+                board.make_move(board.parse_uci_move(text, self.move_list))
+            except ValueError as error:
+                self.send(f"info string {error}")
+                return
+        self.board = board
+
+    def start_search(self, params):
+        search = Search(self.board)
+        search.node_limit = params.get("nodes")
+        budget = time_budget(params, self.board.turn)
+        if budget is not None and not params.get("ponder") and not params.get("infinite"):
+            search.deadline = time.monotonic() + budget
+
+        self.go_params = params
+        self.release = threading.Event()
+        if not params.get("ponder") and not params.get("infinite"):
+            self.release.set()
+        self.search = search
+        max_depth = params.get("depth", MAX_DEPTH)
+        self.search_thread = threading.Thread(target=self.think, args=(search, max_depth, self.release), daemon=True)
+        self.search_thread.start()
+
+    def think(self, search, max_depth, release):
+        """Search thread: search, wait until the move may be sent, then send it"""
+        def send_info(depth, score, nodes, seconds, line):
+            nps = int(nodes / seconds) if seconds > 0 else 0
+            pv = " ".join(move_to_uci(move) for move in line)
+            self.send(f"info depth {depth} score {format_score(score)} nodes {nodes} nps {nps} "
+                      f"time {int(seconds * 1000)} pv {pv}")
+
+        line = search.run(max_depth, send_info)
+        release.wait()
+        if not line:
+            self.send("bestmove 0000")
+        elif len(line) > 1:
+            self.send(f"bestmove {move_to_uci(line[0])} ponder {move_to_uci(line[1])}")
+        else:
+            self.send(f"bestmove {move_to_uci(line[0])}")
+
+    def ponderhit(self):
+        """The opponent played the predicted move: keep searching, now against the clock"""
+        if not self.search or self.release.is_set():
+            return
+        budget = time_budget(self.go_params, self.board.turn)
+        if budget is not None and not self.go_params.get("infinite"):
+            self.search.deadline = time.monotonic() + budget
+        self.release.set()
+
+    def stop_search(self):
+        """Stop the running search, if any, and wait for its best move to be sent"""
+        if not self.search_thread:
+            return
+        self.search.stop()
+        self.release.set()
+        self.search_thread.join()
+        self.search_thread = None
+        self.search = None
+
+def main():
+    engine = UciEngine()
+    commands = queue.Queue()
+    reader = threading.Thread(target=read_commands, args=(sys.stdin, commands), daemon=True)
+    reader.start()
+    while engine.handle(commands.get()):
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())